@@ -11,6 +11,8 @@
 import os
 import json
 import requests
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
 from typing import Dict, Any, Optional
 from loguru import logger
 from app.config import config
@@ -19,6 +21,16 @@ from app.utils.utils import get_uuid, storage_dir
 from app.services.prompts import PromptManager
 
 
+@lru_cache(maxsize=1)
+def _get_session() -> requests.Session:
+    """获取进程内共享的HTTP会话，分析和文案生成的多次请求复用同一连接池，免去重复的TLS握手"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 class SubtitleAnalyzer:
     """字幕剧情分析器，负责分析字幕内容并提取关键剧情段落"""
     
@@ -155,7 +167,7 @@ class SubtitleAnalyzer:
             url = f"{self.base_url}/models/{self.model}:generateContent?key={self.api_key}"
 
             # 发送请求
-            response = requests.post(
+            response = _get_session().post(
                 url,
                 json=payload,
                 headers={"Content-Type": "application/json", "User-Agent": "NarratoAI/1.0"},
@@ -246,7 +258,7 @@ class SubtitleAnalyzer:
             url = f"{self.base_url}/chat/completions"
 
             # 发送HTTP请求
-            response = requests.post(url, headers=self.headers, json=payload, timeout=120)
+            response = _get_session().post(url, headers=self.headers, json=payload, timeout=120)
 
             # 解析响应
             if response.status_code == 200:
@@ -443,7 +455,7 @@ class SubtitleAnalyzer:
             url = f"{self.base_url}/models/{self.model}:generateContent?key={self.api_key}"
 
             # 发送请求
-            response = requests.post(
+            response = _get_session().post(
                 url,
                 json=payload,
                 headers={"Content-Type": "application/json", "User-Agent": "NarratoAI/1.0"},
@@ -538,7 +550,7 @@ class SubtitleAnalyzer:
             url = f"{self.base_url}/chat/completions"
 
             # 发送HTTP请求
-            response = requests.post(url, headers=self.headers, json=payload, timeout=120)
+            response = _get_session().post(url, headers=self.headers, json=payload, timeout=120)
 
             # 解析响应
             if response.status_code == 200:
@@ -1,21 +1,16 @@
 import os
 import json
-import subprocess
 import edge_tts
 from edge_tts import submaker
 from pydub import AudioSegment
 from typing import List, Dict
 from loguru import logger
-from app.utils import utils
+from app.utils import utils, ffmpeg_utils
 
 
 def check_ffmpeg():
     """检查FFmpeg是否已安装"""
-    try:
-        subprocess.run(['ffmpeg', '-version'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        return True
-    except FileNotFoundError:
-        return False
+    return ffmpeg_utils.check_ffmpeg_installation()
 
 
 def merge_audio_files(task_id: str, total_duration: float, list_script: list):
@@ -13,7 +13,7 @@ import subprocess
 import json
 import hashlib
 from loguru import logger
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 from pathlib import Path
 
 from app.utils import ffmpeg_utils
@@ -546,44 +546,13 @@ def try_fallback_encoding(
     return execute_simple_command(fallback_cmd, timestamp, "通用Fallback")
 
 
-def clip_video(
-        video_origin_path: str,
-        tts_result: List[Dict],
-        output_dir: Optional[str] = None,
-        task_id: Optional[str] = None
-) -> Dict[str, str]:
+def _get_encoder_settings() -> Tuple[Dict[str, str], List[str]]:
     """
-    根据时间戳裁剪视频 - 优化版本，增强Windows兼容性和错误处理
-
-    Args:
-        video_origin_path: 原始视频的路径
-        tts_result: 包含时间戳和持续时间信息的列表
-        output_dir: 输出目录路径，默认为None时会自动生成
-        task_id: 任务ID，用于生成唯一的输出目录，默认为None时会自动生成
+    检测硬件加速并返回编码器配置和硬件加速参数
 
     Returns:
-        Dict[str, str]: 时间戳到裁剪后视频路径的映射
+        Tuple[Dict[str, str], List[str]]: (编码器配置, 硬件加速参数)
     """
-    # 检查视频文件是否存在
-    if not os.path.exists(video_origin_path):
-        raise FileNotFoundError(f"视频文件不存在: {video_origin_path}")
-
-    # 如果未提供task_id，则根据输入生成一个唯一ID
-    if task_id is None:
-        content_for_hash = f"{video_origin_path}_{json.dumps(tts_result)}"
-        task_id = hashlib.md5(content_for_hash.encode()).hexdigest()
-
-    # 设置输出目录
-    if output_dir is None:
-        output_dir = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-            "storage", "temp", "clip_video", task_id
-        )
-
-    # 确保输出目录存在
-    Path(output_dir).mkdir(parents=True, exist_ok=True)
-
-    # 获取硬件加速支持
     hwaccel_type = check_hardware_acceleration()
     hwaccel_args = []
     
@@ -597,63 +566,134 @@ def clip_video(
     # 获取编码器配置
     encoder_config = get_safe_encoder_config(hwaccel_type)
     logger.debug(f"编码器配置: {encoder_config}")
+    return encoder_config, hwaccel_args
+
+
+def clip_video_segment(
+        video_origin_path: str,
+        item: Dict,
+        output_dir: str,
+        encoder_config: Dict[str, str],
+        hwaccel_args: List[str],
+        progress: str = ""
+) -> Optional[str]:
+    """
+    按单个TTS结果的时间戳和时长裁剪一个视频片段
+
+    Args:
+        video_origin_path: 原始视频的路径
+        item: 包含时间戳和持续时间信息的TTS结果
+        output_dir: 输出目录路径
+        encoder_config: 编码器配置
+        hwaccel_args: 硬件加速参数
+        progress: 日志中显示的进度前缀，如"[1/10] "
+
+    Returns:
+        Optional[str]: 裁剪后的视频路径，失败时返回None
+    """
+    timestamp = item["timestamp"]
+    start_time, _ = parse_timestamp(timestamp)
+
+    # 根据持续时间计算真正的结束时间（加上1秒余量）
+    duration = item["duration"]
+    calculated_end_time = calculate_end_time(start_time, duration)
+
+    # 转换为FFmpeg兼容的时间格式（逗号替换为点）
+    ffmpeg_start_time = start_time.replace(',', '.')
+    ffmpeg_end_time = calculated_end_time.replace(',', '.')
+
+    # 格式化输出文件名（使用连字符替代冒号和逗号）
+    safe_start_time = start_time.replace(':', '-').replace(',', '-')
+    safe_end_time = calculated_end_time.replace(':', '-').replace(',', '-')
+    output_filename = f"vid_{safe_start_time}@{safe_end_time}.mp4"
+    output_path = os.path.join(output_dir, output_filename)
+
+    # 构建FFmpeg命令
+    ffmpeg_cmd = build_ffmpeg_command(
+        video_origin_path, 
+        output_path, 
+        ffmpeg_start_time, 
+        ffmpeg_end_time,
+        encoder_config,
+        hwaccel_args
+    )
+
+    # 执行FFmpeg命令
+    logger.info(f"📹 {progress}裁剪视频片段: {timestamp} -> {ffmpeg_start_time}到{ffmpeg_end_time}")
+    
+    success = execute_ffmpeg_with_fallback(
+        ffmpeg_cmd, 
+        timestamp,
+        video_origin_path,
+        output_path,
+        ffmpeg_start_time,
+        ffmpeg_end_time
+    )
+    return output_path if success else None
+
+
+def clip_video_incremental(
+        video_origin_path: str,
+        tts_results: Iterable[Dict],
+        output_dir: str,
+        total_clips: Optional[int] = None
+) -> Dict[str, str]:
+    """
+    逐个消费TTS结果并裁剪视频，可以边生成配音边裁剪
+
+    Args:
+        video_origin_path: 原始视频的路径
+        tts_results: 包含时间戳和持续时间信息的TTS结果，可以是逐个产出结果的生成器
+        output_dir: 输出目录路径
+        total_clips: 片段总数，仅用于日志显示，未知时为None
+
+    Returns:
+        Dict[str, str]: 时间戳到裁剪后视频路径的映射
+    """
+    # 检查视频文件是否存在
+    if not os.path.exists(video_origin_path):
+        raise FileNotFoundError(f"视频文件不存在: {video_origin_path}")
+
+    # 确保输出目录存在
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    # 获取硬件加速支持和编码器配置
+    encoder_config, hwaccel_args = _get_encoder_settings()
 
     # 统计信息
-    total_clips = len(tts_result)
     result = {}
     failed_clips = []
     success_count = 0
+    total_label = total_clips if total_clips is not None else "?"
 
-    logger.info(f"📹 开始裁剪视频，总共{total_clips}个片段")
+    if total_clips is not None:
+        logger.info(f"📹 开始裁剪视频，总共{total_clips}个片段")
+    else:
+        logger.info("📹 开始裁剪视频，随配音生成逐个处理片段")
 
-    for i, item in enumerate(tts_result, 1):
+    i = 0
+    for i, item in enumerate(tts_results, 1):
         _id = item.get("_id", item.get("timestamp", "unknown"))
         timestamp = item["timestamp"]
-        start_time, _ = parse_timestamp(timestamp)
-
-        # 根据持续时间计算真正的结束时间（加上1秒余量）
-        duration = item["duration"]
-        calculated_end_time = calculate_end_time(start_time, duration)
-
-        # 转换为FFmpeg兼容的时间格式（逗号替换为点）
-        ffmpeg_start_time = start_time.replace(',', '.')
-        ffmpeg_end_time = calculated_end_time.replace(',', '.')
-
-        # 格式化输出文件名（使用连字符替代冒号和逗号）
-        safe_start_time = start_time.replace(':', '-').replace(',', '-')
-        safe_end_time = calculated_end_time.replace(':', '-').replace(',', '-')
-        output_filename = f"vid_{safe_start_time}@{safe_end_time}.mp4"
-        output_path = os.path.join(output_dir, output_filename)
-
-        # 构建FFmpeg命令
-        ffmpeg_cmd = build_ffmpeg_command(
-            video_origin_path, 
-            output_path, 
-            ffmpeg_start_time, 
-            ffmpeg_end_time,
-            encoder_config,
-            hwaccel_args
-        )
 
-        # 执行FFmpeg命令
-        logger.info(f"📹 [{i}/{total_clips}] 裁剪视频片段: {timestamp} -> {ffmpeg_start_time}到{ffmpeg_end_time}")
-        
-        success = execute_ffmpeg_with_fallback(
-            ffmpeg_cmd, 
-            timestamp,
+        output_path = clip_video_segment(
             video_origin_path,
-            output_path,
-            ffmpeg_start_time,
-            ffmpeg_end_time
+            item,
+            output_dir,
+            encoder_config,
+            hwaccel_args,
+            progress=f"[{i}/{total_label}] "
         )
         
-        if success:
+        if output_path:
             result[_id] = output_path
             success_count += 1
-            logger.info(f"✅ [{i}/{total_clips}] 片段裁剪成功: {timestamp}")
+            logger.info(f"✅ [{i}/{total_label}] 片段裁剪成功: {timestamp}")
         else:
             failed_clips.append(timestamp)
-            logger.error(f"❌ [{i}/{total_clips}] 片段裁剪失败: {timestamp}")
+            logger.error(f"❌ [{i}/{total_label}] 片段裁剪失败: {timestamp}")
+
+    total_clips = i
 
     # 最终统计
     logger.info(f"📊 视频裁剪完成: 成功 {success_count}/{total_clips}, 失败 {len(failed_clips)}")
@@ -672,6 +712,56 @@ def clip_video(
     return result
 
 
+def get_clip_output_dir(task_id: str) -> str:
+    """
+    获取视频裁剪的默认输出目录
+
+    Args:
+        task_id: 任务ID
+
+    Returns:
+        str: storage/temp/clip_video/{task_id}
+    """
+    return os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "storage", "temp", "clip_video", task_id
+    )
+
+
+def clip_video(
+        video_origin_path: str,
+        tts_result: List[Dict],
+        output_dir: Optional[str] = None,
+        task_id: Optional[str] = None
+) -> Dict[str, str]:
+    """
+    根据时间戳裁剪视频 - 优化版本，增强Windows兼容性和错误处理
+
+    Args:
+        video_origin_path: 原始视频的路径
+        tts_result: 包含时间戳和持续时间信息的列表
+        output_dir: 输出目录路径，默认为None时会自动生成
+        task_id: 任务ID，用于生成唯一的输出目录，默认为None时会自动生成
+
+    Returns:
+        Dict[str, str]: 时间戳到裁剪后视频路径的映射
+    """
+    # 检查视频文件是否存在
+    if not os.path.exists(video_origin_path):
+        raise FileNotFoundError(f"视频文件不存在: {video_origin_path}")
+
+    # 如果未提供task_id，则根据输入生成一个唯一ID
+    if task_id is None:
+        content_for_hash = f"{video_origin_path}_{json.dumps(tts_result)}"
+        task_id = hashlib.md5(content_for_hash.encode()).hexdigest()
+
+    # 设置输出目录
+    if output_dir is None:
+        output_dir = get_clip_output_dir(task_id)
+
+    return clip_video_incremental(video_origin_path, tts_result, output_dir, total_clips=len(tts_result))
+
+
 if __name__ == "__main__":
     video_origin_path = "/Users/apple/Desktop/home/NarratoAI/resource/videos/qyn2-2无片头片尾.mp4"
 
@@ -15,6 +15,11 @@ import asyncio
 from openai import OpenAI
 from loguru import logger
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # 导入新的LLM服务模块 - 确保提供商被注册
 import app.services.llm  # 这会触发提供商注册
 from app.services.llm.migration_adapter import generate_narration as generate_narration_new
@@ -35,8 +40,9 @@ def parse_frame_analysis_to_markdown(json_file_path):
     
     try:
         # 读取JSON文件
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
+        with open(json_file_path, 'rb') as file:
+            raw = file.read()
+        data = orjson.loads(raw) if orjson else json.loads(raw)
         
         # 初始化Markdown字符串
         markdown = ""
@@ -418,17 +418,23 @@ def wrap_text(text, max_width, font="Arial", fontsize=60):
         return result, height
 
     _wrapped_lines_ = []
-    chars = list(text)
-    _txt_ = ""
-    for word in chars:
-        _txt_ += word
-        _width, _height = get_text_size(_txt_)
-        if _width <= max_width:
-            continue
-        else:
-            _wrapped_lines_.append(_txt_)
-            _txt_ = ""
-    _wrapped_lines_.append(_txt_)
+    line_start = 0
+    text_len = len(text)
+    while True:
+        # 二分查找当前行中首次超出最大宽度的位置，避免逐字符测量
+        low, high = line_start + 1, text_len + 1
+        while low < high:
+            mid = (low + high) // 2
+            _width, _height = get_text_size(text[line_start:mid])
+            if _width > max_width:
+                high = mid
+            else:
+                low = mid + 1
+        if low > text_len:
+            break
+        _wrapped_lines_.append(text[line_start:low])
+        line_start = low
+    _wrapped_lines_.append(text[line_start:])
     result = "\n".join(_wrapped_lines_).strip()
     height = len(_wrapped_lines_) * height
     return result, height
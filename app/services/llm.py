@@ -19,8 +19,24 @@ from typing import Union, TextIO
 from app.config import config
 from app.utils.utils import clean_model_output
 
+try:
+    # orjson 直接序列化为UTF-8字节并从字节解析响应，比标准库更快
+    import orjson
+except ImportError:
+    orjson = None
+
 _max_retries = 5
 
+# 文心一言请求体中除消息外的固定参数，每次调用只需补充 messages
+_ERNIE_BODY_TEMPLATE = {
+    "temperature": 0.5,
+    "top_p": 0.8,
+    "penalty_score": 1,
+    "disable_search": False,
+    "enable_citation": False,
+    "response_format": "text",
+}
+
 Method = """
 重要提示：每一部剧的文案，前几句必须吸引人
 首先我们在看完看懂电影后，大脑里面要先有一个大概的轮廓，也就是一个类似于作文的大纲，电影主题线在哪里，首先要找到。
@@ -305,22 +321,14 @@ def _generate_response(prompt: str, llm_provider: str = None) -> str:
             )
             url = f"{base_url}?access_token={access_token}"
 
-            payload = json.dumps(
-                {
-                    "messages": [{"role": "user", "content": prompt}],
-                    "temperature": 0.5,
-                    "top_p": 0.8,
-                    "penalty_score": 1,
-                    "disable_search": False,
-                    "enable_citation": False,
-                    "response_format": "text",
-                }
-            )
+            body = {"messages": [{"role": "user", "content": prompt}], **_ERNIE_BODY_TEMPLATE}
+            payload = orjson.dumps(body) if orjson else json.dumps(body)
             headers = {"Content-Type": "application/json"}
 
             response = requests.request(
                 "POST", url, headers=headers, data=payload
-            ).json()
+            )
+            response = orjson.loads(response.content) if orjson else response.json()
             return response.get("result")
 
         if llm_provider == "azure":
@@ -20,6 +20,7 @@ from .manager import LLMServiceManager
 from .base import BaseLLMProvider, VisionModelProvider, TextModelProvider
 from .validators import OutputValidator, ValidationError
 from .exceptions import LLMServiceError, ProviderNotFoundError, ConfigurationError
+from .providers._http import aclose_loop_clients, close_loop_clients
 
 # 确保提供商在模块导入时被注册
 def _ensure_providers_registered():
@@ -45,7 +46,9 @@ __all__ = [
     'ValidationError',
     'LLMServiceError',
     'ProviderNotFoundError', 
-    'ConfigurationError'
+    'ConfigurationError',
+    'aclose_loop_clients',
+    'close_loop_clients'
 ]
 
 # 版本信息
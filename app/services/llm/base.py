@@ -4,13 +4,90 @@
 定义了统一的大模型服务接口，包括视觉模型和文本生成模型的抽象基类
 """
 
+import asyncio
+import hashlib
+import io
+import re
+import threading
+from collections import OrderedDict
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional, Union
+from typing import AsyncIterator, Collection, List, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
 import PIL.Image
 from loguru import logger
 
 from .exceptions import LLMServiceError, ConfigurationError
+from .cache import LLMCache
+
+try:
+    # pybase64 使用SIMD指令加速base64编码，接口与标准库一致
+    from pybase64 import b64encode
+except ImportError:
+    from base64 import b64encode
+
+try:
+    # simplejpeg 基于 libjpeg-turbo，直接编码 numpy 数组，比 PIL 保存 JPEG 更快
+    import numpy as np
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+# 视觉分析时同时进行的批次请求数上限，避免触发服务端限流
+MAX_CONCURRENT_BATCHES = 4
+# 上传图片时使用的JPEG压缩质量
+JPEG_QUALITY = 85
+# 上传图片的最长边上限（像素），超出时先缩小再编码
+MAX_IMAGE_DIM = 1024
+# 已编码图片缓存的默认总大小上限（字节），可通过 encoded_cache_max_mb 配置
+ENCODED_IMAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+_JPEG_DATA_URL_PREFIX = "data:image/jpeg;base64,"
+# 记录可直接上传的原始JPEG文件路径的图片属性名
+_RAW_JPEG_PATH_ATTR = "_narrato_raw_jpeg_path"
+
+# 按图片内容指纹缓存base64编码结果，重复分析相同帧时跳过JPEG编码，需通过 encoded_cache_enabled 开启
+_encoded_image_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_encoded_image_cache_bytes = 0
+_encoded_image_cache_lock = threading.Lock()
+# 视觉分析结果缓存：相同提供商、模型、提示词和图片的批次直接复用已有结果，需通过 result_cache_enabled 开启
+_vision_result_cache = LLMCache()
+
+# 每个编码线程复用一个BytesIO缓冲区，避免每张图片重新分配和扩容
+_encode_buffers = threading.local()
+
+# 模型不支持 response_format 时追加到提示词末尾的JSON格式约束
+JSON_FORMAT_INSTRUCTION = "\n\n请确保输出严格的JSON格式，不要包含任何其他文字或标记。"
+
+# JSON输出中需要移除的markdown代码块标记，按顺序依次应用；
+# 行首的```由前三条逐行规则清除，最后一条处理紧跟在内容后的结尾```
+_JSON_FENCE_PATTERNS = (
+    re.compile(r'^```json\s*', re.MULTILINE),
+    re.compile(r'^```\s*$', re.MULTILINE),
+    re.compile(r'^```.*$', re.MULTILINE),
+    re.compile(r'```$'),
+)
+
+
+def clean_json_output(output: str) -> str:
+    """清理JSON输出，移除markdown标记等"""
+    if '```' not in output:
+        return output.strip()
+    
+    # 常见情况：整段输出被 ```json ... ``` 包裹，直接切片去掉首尾标记
+    if output.startswith('```'):
+        first_line, _, body = output.partition('\n')
+        body = body.rstrip()
+        if body == '```' or body.endswith('\n```'):
+            body = body[:-3]
+        if first_line.rstrip() in ('```', '```json') and '```' not in body:
+            return body.strip()
+    
+    # 移除可能的markdown代码块标记
+    for pattern in _JSON_FENCE_PATTERNS:
+        output = pattern.sub('', output)
+    
+    # 移除前后空白字符
+    return output.strip()
 
 
 class BaseLLMProvider(ABC):
@@ -49,8 +126,8 @@ class BaseLLMProvider(ABC):
     
     @property
     @abstractmethod
-    def supported_models(self) -> List[str]:
-        """支持的模型列表"""
+    def supported_models(self) -> Collection[str]:
+        """支持的模型集合，建议返回模块级 frozenset 常量"""
         pass
     
     def _validate_config(self):
@@ -109,8 +186,281 @@ class VisionModelProvider(BaseLLMProvider):
         """
         pass
     
-    def _prepare_images(self, images: List[Union[str, Path, PIL.Image.Image]]) -> List[PIL.Image.Image]:
-        """预处理图片，统一转换为PIL.Image对象"""
+    @abstractmethod
+    async def _analyze_batch(self, batch: List[PIL.Image.Image], prompt: str, encoded: List[str]) -> str:
+        """分析一批图片，encoded 为与 batch 一一对应的base64编码"""
+        pass
+    
+    async def _analyze_batches(self,
+                               images: List[Union[str, Path, PIL.Image.Image]],
+                               prompt: str,
+                               batch_size: int,
+                               max_concurrent_tasks: Optional[int] = None,
+                               max_image_dim: Optional[int] = None) -> List[str]:
+        """
+        将图片分批并发分析，结果顺序与批次顺序一致
+        
+        Args:
+            images: 图片路径列表或PIL图片对象列表，按批次在处理时才加载
+            prompt: 分析提示词
+            batch_size: 批处理大小
+            max_concurrent_tasks: 同时进行的批次请求数上限，未指定时使用实例配置或默认值
+            max_image_dim: 图片最长边上限，未指定时使用实例配置或默认值
+            
+        Returns:
+            每个批次的分析结果列表，失败的批次返回错误描述
+        """
+        # 结果按批次下标写入，保证顺序与批次顺序一致
+        results: List[Optional[str]] = [None] * len(range(0, len(images), batch_size))
+        async for batch_index, result in self._iter_batch_results(
+            images, prompt, batch_size, max_concurrent_tasks, max_image_dim
+        ):
+            results[batch_index] = result
+        return results
+    
+    async def _iter_batch_results(self,
+                                  images: List[Union[str, Path, PIL.Image.Image]],
+                                  prompt: str,
+                                  batch_size: int,
+                                  max_concurrent_tasks: Optional[int] = None,
+                                  max_image_dim: Optional[int] = None) -> AsyncIterator[Tuple[int, str]]:
+        """
+        将图片分批并发分析，按完成顺序逐个产出 (批次下标, 分析结果)
+        
+        图片加载、编码与批次请求以流水线方式进行：加载编码任务逐批预处理图片并写入有界队列，
+        多个请求任务从队列中取出批次并调用接口，同一时间只有少量批次的解码图片驻留内存。
+        编码结果完全相同的批次（如静止画面）只请求一次，其余批次直接复用该结果。
+        调用方可在慢批次完成前先处理已完成的批次
+        
+        Args:
+            images: 图片路径列表或PIL图片对象列表
+            prompt: 分析提示词
+            batch_size: 批处理大小
+            max_concurrent_tasks: 同时进行的批次请求数上限，未指定时使用实例配置或默认值
+            max_image_dim: 图片最长边上限，未指定时使用实例配置或默认值
+            
+        Yields:
+            (批次下标, 分析结果)，失败的批次结果为错误描述
+        """
+        # 只切分图片路径/对象列表，解码在批次处理时进行
+        batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+        concurrency = max(1, int(max_concurrent_tasks or self.config.get('max_concurrent_tasks') or MAX_CONCURRENT_BATCHES))
+        workers = min(concurrency, len(batches))
+        # {批次图片摘要: 首个相同批次的下标}，{已完成批次下标: 结果}，{首个相同批次的下标: [重复批次下标]}
+        first_batch_index: Dict[tuple, int] = {}
+        finished: Dict[int, str] = {}
+        waiting_duplicates: Dict[int, List[int]] = {}
+        # 有界队列：编码最多领先请求若干批次，既不让网络请求等待编码，也不一次性占用全部内存
+        queue: "asyncio.Queue[Optional[tuple]]" = asyncio.Queue(maxsize=concurrency * 2)
+        # 已完成的批次结果，None 表示全部批次处理结束
+        completed: "asyncio.Queue[Optional[Tuple[int, str]]]" = asyncio.Queue()
+        
+        def reuse_result(batch_index: int, original_index: int):
+            logger.info(f"第 {batch_index + 1} 批与第 {original_index + 1} 批图片相同，复用分析结果")
+            completed.put_nowait((batch_index, finished[original_index]))
+        
+        async def produce():
+            for batch_index in range(len(batches)):
+                # 取出后释放列表中的引用，批次处理完成后其解码图片即可被回收
+                raw_batch, batches[batch_index] = batches[batch_index], None
+                # 在线程池中加载本批次图片，避免阻塞事件循环
+                batch = await asyncio.to_thread(self._prepare_images, raw_batch, max_image_dim)
+                if not batch:
+                    finished[batch_index] = "批次处理失败: 图片加载失败"
+                    completed.put_nowait((batch_index, finished[batch_index]))
+                    continue
+                
+                # 在线程池中编码本批次图片，编码结果随批次传给请求任务
+                encoded = await self._pre_encode_images(batch)
+                digests = None
+                if encoded is not None:
+                    # 以编码结果的摘要作为批次内容标识
+                    digests = tuple(hashlib.blake2b(data.encode('ascii'), digest_size=16).digest() for data in encoded)
+                    original_index = first_batch_index.get(digests)
+                    if original_index is not None:
+                        if original_index in finished:
+                            reuse_result(batch_index, original_index)
+                        else:
+                            waiting_duplicates.setdefault(original_index, []).append(batch_index)
+                        continue
+                    first_batch_index[digests] = batch_index
+                await queue.put((batch_index, batch, encoded, digests))
+            for _ in range(workers):
+                await queue.put(None)
+        
+        async def consume():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                batch_index, batch, encoded, digests = item
+                cache_key = self._batch_cache_key(prompt, digests) if digests is not None else None
+                result = await _vision_result_cache.get(cache_key) if cache_key else None
+                if result is not None:
+                    logger.info(f"第 {batch_index + 1} 批命中视觉分析结果缓存")
+                else:
+                    logger.info(f"处理第 {batch_index + 1} 批，共 {len(batch)} 张图片")
+                    try:
+                        if encoded is None:
+                            # 预编码失败时重新编码，错误作为批次失败报告
+                            encoded = await self._encode_images(batch)
+                        result = await self._analyze_batch(batch, prompt, encoded)
+                        if cache_key:
+                            await _vision_result_cache.set(cache_key, result)
+                    except Exception as e:
+                        logger.error(f"批次 {batch_index + 1} 处理失败: {str(e)}")
+                        result = f"批次处理失败: {str(e)}"
+                
+                finished[batch_index] = result
+                completed.put_nowait((batch_index, result))
+                for duplicate_index in waiting_duplicates.pop(batch_index, ()):
+                    reuse_result(duplicate_index, batch_index)
+        
+        async def run():
+            consumers = [asyncio.create_task(consume()) for _ in range(workers)]
+            try:
+                await asyncio.gather(produce(), *consumers)
+            finally:
+                # produce 出错时消费任务仍在等待队列，需显式取消，避免事件循环关闭时残留挂起任务
+                for consumer in consumers:
+                    consumer.cancel()
+                await asyncio.gather(*consumers, return_exceptions=True)
+                completed.put_nowait(None)
+        
+        runner = asyncio.create_task(run())
+        try:
+            while True:
+                item = await completed.get()
+                if item is None:
+                    break
+                yield item
+            # 传播流水线中未被捕获的异常
+            await runner
+        finally:
+            if not runner.done():
+                runner.cancel()
+    
+    def _batch_cache_key(self, prompt: str, digests: Tuple[bytes, ...]) -> Optional[str]:
+        """根据批次图片编码结果的摘要生成结果缓存键，未开启结果缓存时返回None"""
+        if not self.config.get('result_cache_enabled'):
+            return None
+        return LLMCache.make_key({
+            "provider": self.provider_name,
+            "model": self.model_name,
+            "prompt": prompt,
+            "images": [digest.hex() for digest in digests],
+        })
+    
+    async def _encode_images(self, images: List[PIL.Image.Image]) -> List[str]:
+        """在线程池中并发编码图片为base64，避免在事件循环线程中串行执行CPU密集的编码和文件读取"""
+        return list(await asyncio.gather(*(asyncio.to_thread(self._image_to_base64, img) for img in images)))
+    
+    def _to_data_urls(self, encoded: List[str]) -> List[str]:
+        """将base64编码的JPEG转换为可直接放入 image_url 的 data URL"""
+        return [_JPEG_DATA_URL_PREFIX + data for data in encoded]
+    
+    async def _pre_encode_images(self, images: List[PIL.Image.Image]) -> Optional[List[str]]:
+        """预先编码一批图片，失败时返回None"""
+        try:
+            return await self._encode_images(images)
+        except Exception as e:
+            # 预编码失败不影响后续处理，批次请求时会重新编码并报告错误
+            logger.warning(f"图片预编码失败: {str(e)}")
+            return None
+    
+    @property
+    def jpeg_quality(self) -> int:
+        """重新编码图片时使用的JPEG质量，可通过 jpeg_quality 配置"""
+        return int(self.config.get('jpeg_quality') or JPEG_QUALITY)
+    
+    @property
+    def encoded_cache_max_bytes(self) -> int:
+        """已编码图片缓存的总大小上限（字节），可通过 encoded_cache_max_mb 配置"""
+        max_mb = self.config.get('encoded_cache_max_mb')
+        return int(float(max_mb) * 1024 * 1024) if max_mb else ENCODED_IMAGE_CACHE_MAX_BYTES
+    
+    @property
+    def max_image_dim(self) -> int:
+        """上传图片的最长边上限，可通过 max_image_dim 配置"""
+        return int(self.config.get('max_image_dim') or MAX_IMAGE_DIM)
+    
+    def _encode_jpeg(self, img: PIL.Image.Image) -> bytes:
+        """将PIL图片编码为JPEG字节，优先使用simplejpeg"""
+        if simplejpeg is not None:
+            rgb_img = img if img.mode == 'RGB' else img.convert('RGB')
+            return simplejpeg.encode_jpeg(
+                np.asarray(rgb_img), quality=self.jpeg_quality, colorspace='RGB', fastdct=True
+            )
+        
+        img_buffer = getattr(_encode_buffers, 'buffer', None)
+        if img_buffer is None:
+            img_buffer = _encode_buffers.buffer = io.BytesIO()
+        img_buffer.seek(0)
+        img_buffer.truncate()
+        img.save(img_buffer, format='JPEG', quality=self.jpeg_quality, optimize=False)
+        return img_buffer.getvalue()
+    
+    def _image_to_base64(self, img: PIL.Image.Image) -> str:
+        """将PIL图片转换为base64编码，开启编码缓存时相同内容的图片复用缓存结果"""
+        global _encoded_image_cache_bytes
+        
+        # 未经缩放的JPEG文件直接上传原始字节，无需解码和重新编码
+        raw_jpeg_path = getattr(img, _RAW_JPEG_PATH_ATTR, None)
+        if raw_jpeg_path:
+            try:
+                with open(raw_jpeg_path, 'rb') as f:
+                    return b64encode(f.read()).decode('ascii')
+            except OSError as e:
+                logger.warning(f"读取原始JPEG失败，改为重新编码 {raw_jpeg_path}: {str(e)}")
+        
+        # 未开启缓存时直接编码，省去复制像素数据和计算指纹的开销
+        if not self.config.get('encoded_cache_enabled'):
+            return b64encode(self._encode_jpeg(img)).decode('ascii')
+        
+        fingerprint = hashlib.blake2b(
+            f"{img.mode}:{img.size}:{self.jpeg_quality}".encode() + img.tobytes(), digest_size=16
+        ).digest()
+        with _encoded_image_cache_lock:
+            cached = _encoded_image_cache.get(fingerprint)
+            if cached is not None:
+                _encoded_image_cache.move_to_end(fingerprint)
+                return cached
+        
+        encoded = b64encode(self._encode_jpeg(img)).decode('ascii')
+        max_bytes = self.encoded_cache_max_bytes
+        
+        with _encoded_image_cache_lock:
+            if fingerprint not in _encoded_image_cache:
+                _encoded_image_cache[fingerprint] = encoded
+                _encoded_image_cache_bytes += len(encoded)
+                # 超出容量时淘汰最久未使用的条目
+                while _encoded_image_cache_bytes > max_bytes and _encoded_image_cache:
+                    _, evicted = _encoded_image_cache.popitem(last=False)
+                    _encoded_image_cache_bytes -= len(evicted)
+        return encoded
+    
+    def _image_to_data_url(self, img: PIL.Image.Image) -> str:
+        """将PIL图片转换为可直接放入 image_url 的 data URL"""
+        return _JPEG_DATA_URL_PREFIX + self._image_to_base64(img)
+    
+    def _text_part(self, text: str) -> Dict[str, str]:
+        """构建OpenAI兼容接口的文本内容片段"""
+        return {"type": "text", "text": text}
+    
+    def _prepare_images(self,
+                        images: List[Union[str, Path, PIL.Image.Image]],
+                        max_image_dim: Optional[int] = None) -> List[PIL.Image.Image]:
+        """
+        预处理图片，统一转换为PIL.Image对象
+        
+        Args:
+            images: 图片路径列表或PIL图片对象列表
+            max_image_dim: 图片最长边上限，未指定时使用实例配置或默认值
+            
+        Returns:
+            预处理后的图片列表
+        """
+        max_dim = int(max_image_dim or self.max_image_dim)
         processed_images = []
         
         for img in images:
@@ -124,8 +474,14 @@ class VisionModelProvider(BaseLLMProvider):
                     continue
                 
                 # 调整图片大小以优化性能
-                if pil_img.size[0] > 1024 or pil_img.size[1] > 1024:
-                    pil_img.thumbnail((1024, 1024), PIL.Image.Resampling.LANCZOS)
+                if pil_img.size[0] > max_dim or pil_img.size[1] > max_dim:
+                    if isinstance(img, (str, Path)) and pil_img.format == 'JPEG':
+                        # 让libjpeg在解码时直接按DCT缩放，只解码出接近目标尺寸的图像
+                        pil_img.draft('RGB', (max_dim, max_dim))
+                    pil_img.thumbnail((max_dim, max_dim), PIL.Image.Resampling.BILINEAR)
+                elif isinstance(img, (str, Path)) and pil_img.format == 'JPEG' and pil_img.mode in ('RGB', 'L'):
+                    # 记录原始文件路径，编码时直接使用文件内容
+                    setattr(pil_img, _RAW_JPEG_PATH_ATTR, img)
                 
                 processed_images.append(pil_img)
                 
@@ -173,3 +529,7 @@ class TextModelProvider(BaseLLMProvider):
         messages.append({"role": "user", "content": prompt})
         
         return messages
+    
+    def _clean_json_output(self, output: str) -> str:
+        """清理JSON输出，移除markdown标记等"""
+        return clean_json_output(output)
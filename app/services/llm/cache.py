@@ -0,0 +1,129 @@
+"""
+大模型响应缓存
+
+对确定性（低温度）的文本生成请求做精确匹配缓存，相同请求直接返回已有结果，
+避免重复的网络延迟和token消耗
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Protocol, Tuple
+
+from loguru import logger
+
+
+class CacheBackend(Protocol):
+    """缓存后端协议，可替换为磁盘或Redis等实现"""
+
+    async def get(self, key: str) -> Optional[str]:
+        ...
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        ...
+
+    async def clear(self) -> None:
+        ...
+
+
+class MemoryCacheBackend:
+    """基于LRU的内存缓存后端，支持过期时间"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class LLMCache:
+    """大模型响应精确匹配缓存"""
+
+    # 仅缓存温度不高于该值的请求，高温度下相同输入本应得到不同输出
+    MAX_CACHEABLE_TEMPERATURE = 0.01
+    # 请求中包含这些参数时不缓存（流式输出、工具调用等）
+    UNCACHEABLE_KWARGS = frozenset({"stream", "tools", "tool_choice", "functions"})
+
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl: float = 3600, enabled: bool = True):
+        """
+        初始化缓存
+
+        Args:
+            backend: 缓存后端，默认使用内存LRU
+            ttl: 缓存有效期（秒）
+            enabled: 是否启用缓存
+        """
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def is_cacheable(self, temperature: float, **kwargs) -> bool:
+        """判断请求是否可以缓存"""
+        if not self.enabled or temperature > self.MAX_CACHEABLE_TEMPERATURE:
+            return False
+        return self.UNCACHEABLE_KWARGS.isdisjoint(kwargs)
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """根据请求内容生成缓存键"""
+        serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """读取缓存，同时统计命中率"""
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            logger.debug(f"命中大模型响应缓存: {key[:12]}")
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        """写入缓存"""
+        await self.backend.set(key, value, ttl=self.ttl)
+
+    async def clear(self) -> None:
+        """清空缓存并重置统计"""
+        await self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
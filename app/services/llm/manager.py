@@ -99,7 +99,13 @@ class LLMServiceManager:
             instance = provider_class(
                 api_key=api_key,
                 model_name=model_name,
-                base_url=base_url
+                base_url=base_url,
+                max_concurrent_tasks=config.app.get('vision_max_concurrent_tasks'),
+                jpeg_quality=config.app.get('vision_jpeg_quality'),
+                max_image_dim=config.app.get('vision_max_image_dim'),
+                result_cache_enabled=config.app.get('vision_result_cache_enabled', False),
+                encoded_cache_enabled=config.app.get('vision_encoded_cache_enabled', False),
+                encoded_cache_max_mb=config.app.get('vision_encoded_cache_max_mb')
             )
             
             # 缓存实例
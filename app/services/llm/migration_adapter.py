@@ -5,7 +5,11 @@
 """
 
 import asyncio
+import atexit
+import concurrent.futures
 import json
+import os
+import threading
 from typing import List, Dict, Any, Optional, Union
 from pathlib import Path
 import PIL.Image
@@ -13,30 +17,84 @@ from loguru import logger
 
 from .unified_service import UnifiedLLMService
 from .exceptions import LLMServiceError
+from .base import clean_json_output
+from .providers._http import aclose_loop_clients
+from . import providers  # noqa: F401  导入时注册所有提供商
 # 导入新的提示词管理系统
 from app.services.prompts import PromptManager
 
-# 确保提供商已注册
-def _ensure_providers_registered():
-    """确保所有提供商都已注册"""
+try:
+    import orjson
+
+    def _dumps(obj) -> str:
+        """序列化为JSON字符串，orjson 原生输出UTF-8，中文内容无需转义"""
+        return orjson.dumps(obj).decode("utf-8")
+except ImportError:
+    def _dumps(obj) -> str:
+        """序列化为JSON字符串，保留中文字符"""
+        return json.dumps(obj, ensure_ascii=False)
+
+# 事件循环默认线程池大小，asyncio.to_thread 的并发上限由它决定
+LLM_THREAD_POOL_SIZE = int(os.environ.get("LLM_THREAD_POOL_SIZE", (os.cpu_count() or 1) * 5))
+
+# 所有同步调用共用的后台事件循环，只创建一个线程池和一组HTTP连接池，
+# Streamlit 每次运行脚本都在新线程中，按线程创建事件循环会不断泄漏
+_bg_loop: Optional[asyncio.AbstractEventLoop] = None
+_bg_loop_lock = threading.Lock()
+
+
+def configure_llm_executor(loop: Optional[asyncio.AbstractEventLoop] = None, size: Optional[int] = None):
+    """
+    为事件循环设置更大的默认线程池
+
+    Python 默认线程池只有 min(32, cpu_count + 4) 个线程，仍通过 asyncio.to_thread
+    调用同步接口的提供商在高并发时会排队；analyze_images 的 max_concurrent_tasks
+    应不大于该线程池大小
+
+    Args:
+        loop: 目标事件循环，默认为当前事件循环
+        size: 线程池大小，默认为 LLM_THREAD_POOL_SIZE
+    """
+    loop = loop or asyncio.get_event_loop()
+    loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(
+        max_workers=size or LLM_THREAD_POOL_SIZE,
+        thread_name_prefix="llm-io"
+    ))
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """获取在后台线程中常驻运行的共享事件循环，首次调用时启动"""
+    global _bg_loop
+    with _bg_loop_lock:
+        if _bg_loop is None:
+            loop = asyncio.new_event_loop()
+            configure_llm_executor(loop)
+            threading.Thread(target=loop.run_forever, name="llm-loop", daemon=True).start()
+            _bg_loop = loop
+    return _bg_loop
+
+
+@atexit.register
+def _shutdown_background_loop():
+    """进程退出时关闭后台事件循环上的连接池和线程池"""
+    loop = _bg_loop
+    if loop is None or loop.is_closed():
+        return
     try:
-        from .manager import LLMServiceManager
-        # 检查是否有已注册的提供商
-        if not LLMServiceManager.list_text_providers() or not LLMServiceManager.list_vision_providers():
-            # 如果没有注册的提供商，强制导入providers模块
-            from . import providers
-            logger.debug("迁移适配器强制注册LLM服务提供商")
+        asyncio.run_coroutine_threadsafe(aclose_loop_clients(), loop).result(timeout=5)
+        asyncio.run_coroutine_threadsafe(loop.shutdown_default_executor(), loop).result(timeout=5)
     except Exception as e:
-        logger.error(f"迁移适配器确保LLM服务提供商注册时发生错误: {str(e)}")
-
-# 在模块加载时确保提供商已注册
-_ensure_providers_registered()
+        logger.debug(f"关闭后台事件循环失败: {str(e)}")
+    loop.call_soon_threadsafe(loop.stop)
 
 
 def _run_async_safely(coro_func, *args, **kwargs):
     """
     安全地运行异步协程，处理各种事件循环情况
 
+    协程统一提交到共享的后台事件循环执行，调用线程阻塞等待结果，
+    因此无论调用方是否已有运行中的事件循环都可以使用
+
     Args:
         coro_func: 协程函数（不是协程对象）
         *args: 协程函数的位置参数
@@ -45,28 +103,17 @@ def _run_async_safely(coro_func, *args, **kwargs):
     Returns:
         协程的执行结果
     """
-    def run_in_new_loop():
-        """在新的事件循环中运行协程"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(coro_func(*args, **kwargs))
-        finally:
-            loop.close()
-            asyncio.set_event_loop(None)
-
     try:
-        # 尝试获取当前事件循环
+        loop = _get_background_loop()
         try:
-            loop = asyncio.get_running_loop()
-            # 如果有运行中的事件循环，使用线程池执行
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(run_in_new_loop)
-                return future.result()
+            running_loop = asyncio.get_running_loop()
         except RuntimeError:
-            # 没有运行中的事件循环，直接运行
-            return run_in_new_loop()
+            running_loop = None
+        if running_loop is loop:
+            # 在后台事件循环内同步等待会造成死锁
+            raise RuntimeError("不能在后台事件循环中同步等待协程")
+
+        return asyncio.run_coroutine_threadsafe(coro_func(*args, **kwargs), loop).result()
     except Exception as e:
         logger.error(f"异步执行失败: {str(e)}")
         raise LLMServiceError(f"异步执行失败: {str(e)}")
@@ -131,7 +178,7 @@ class LegacyLLMAdapter:
             if not parsed_result:
                 logger.error("无法解析LLM返回的JSON数据")
                 # 返回一个基本的JSON结构而不是错误字符串
-                return json.dumps({
+                return _dumps({
                     "items": [
                         {
                             "_id": 1,
@@ -140,15 +187,15 @@ class LegacyLLMAdapter:
                             "narration": "解说文案生成失败，请重试"
                         }
                     ]
-                }, ensure_ascii=False)
+                })
 
             # 确保返回的是JSON字符串
-            return json.dumps(parsed_result, ensure_ascii=False)
+            return _dumps(parsed_result)
 
         except Exception as e:
             logger.error(f"生成解说文案失败: {str(e)}")
             # 返回一个基本的JSON结构而不是错误字符串
-            return json.dumps({
+            return _dumps({
                 "items": [
                     {
                         "_id": 1,
@@ -157,7 +204,7 @@ class LegacyLLMAdapter:
                         "narration": f"解说文案生成失败: {str(e)}"
                     }
                 ]
-            }, ensure_ascii=False)
+            })
 
 
 class VisionAnalyzerAdapter:
@@ -232,21 +279,7 @@ class SubtitleAnalyzerAdapter:
 
     def _clean_json_output(self, output: str) -> str:
         """清理JSON输出，移除markdown标记等"""
-        import re
-
-        # 移除可能的markdown代码块标记
-        output = re.sub(r'^```json\s*', '', output, flags=re.MULTILINE)
-        output = re.sub(r'^```\s*$', '', output, flags=re.MULTILINE)
-        output = re.sub(r'^```.*$', '', output, flags=re.MULTILINE)
-
-        # 移除开头和结尾的```标记
-        output = re.sub(r'^```', '', output)
-        output = re.sub(r'```$', '', output)
-
-        # 移除前后空白字符
-        output = output.strip()
-
-        return output
+        return clean_json_output(output)
     
     def analyze_subtitle(self, subtitle_content: str) -> Dict[str, Any]:
         """
@@ -0,0 +1,154 @@
+"""
+提供商共享的HTTP客户端
+
+异步客户端的连接池绑定在创建它的事件循环上，而提供商实例在进程内全局缓存、
+可能在不同线程的事件循环中被调用，因此按事件循环分别缓存客户端。
+建立过连接的客户端会持有其事件循环的引用，自行创建事件循环的调用方需在关闭
+事件循环前调用 close_loop_clients / aclose_loop_clients 释放连接池
+"""
+
+import asyncio
+import atexit
+import importlib.util
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+
+import httpx
+from loguru import logger
+from openai import AsyncOpenAI
+
+# 每个事件循环共享的连接池上限
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 50
+# 安装了 h2（pip install "httpx[http2]"）时启用HTTP/2，多个并发请求复用同一连接
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+# 连接超时、限流(429)和服务端错误(5xx)时由SDK按指数退避加随机抖动自动重试的次数
+OPENAI_MAX_RETRIES = 3
+# 建立连接的超时较短以便快速重试；长文本生成耗时较长，读取超时留足余量
+OPENAI_TIMEOUT = httpx.Timeout(300.0, connect=5.0)
+# 客户端级默认请求头；OpenAI SDK 也共用该客户端，因此不设置 Content-Type，
+# 避免 GET 和 multipart 上传等请求继承 application/json
+HTTP_DEFAULT_HEADERS = {
+    "User-Agent": "NarratoAI/1.0"
+}
+
+# {事件循环: {(api_key, base_url): AsyncOpenAI}}，由 aclose_loop_clients 显式释放
+_async_openai_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, Optional[str]], AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+# {事件循环: httpx.AsyncClient}，同一事件循环下的所有OpenAI客户端共用一个连接池
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def _get_http_client(loop: asyncio.AbstractEventLoop) -> httpx.AsyncClient:
+    """获取事件循环共享的 httpx.AsyncClient，调用方需持有 _clients_lock"""
+    http_client = _http_clients.get(loop)
+    if http_client is None:
+        logger.debug(f"创建共享HTTP连接池，HTTP/2: {'已启用' if _HTTP2_AVAILABLE else '未启用（未安装 h2）'}")
+        http_client = _http_clients[loop] = httpx.AsyncClient(
+            http2=_HTTP2_AVAILABLE,
+            follow_redirects=True,
+            headers=HTTP_DEFAULT_HEADERS,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS
+            )
+        )
+    return http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    获取当前事件循环下共享的 httpx.AsyncClient，供直接调用HTTP接口的提供商使用
+
+    Returns:
+        绑定当前事件循环、保持长连接的 httpx.AsyncClient
+    """
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        return _get_http_client(loop)
+
+
+async def aclose_loop_clients():
+    """关闭当前事件循环上的共享连接池，并移除缓存的客户端"""
+    loop = asyncio.get_running_loop()
+    with _clients_lock:
+        http_client = _http_clients.pop(loop, None)
+        _async_openai_clients.pop(loop, None)
+
+    # AsyncOpenAI 客户端共用该连接池，关闭连接池即可
+    if http_client is not None:
+        await http_client.aclose()
+
+
+def close_loop_clients(loop: asyncio.AbstractEventLoop):
+    """
+    关闭事件循环上的共享连接池，需在 loop.close() 之前调用
+
+    Args:
+        loop: 未在运行且尚未关闭的事件循环
+    """
+    if loop.is_closed() or loop.is_running():
+        logger.warning("事件循环已关闭或正在运行，无法同步关闭其HTTP连接池")
+        return
+    try:
+        loop.run_until_complete(aclose_loop_clients())
+    except Exception as e:
+        logger.debug(f"关闭HTTP连接池失败: {str(e)}")
+
+
+def get_async_openai_client(api_key: str, base_url: Optional[str] = None) -> AsyncOpenAI:
+    """
+    获取当前事件循环下复用的 AsyncOpenAI 客户端
+
+    Args:
+        api_key: API密钥
+        base_url: API基础URL
+
+    Returns:
+        绑定当前事件循环的 AsyncOpenAI 客户端
+    """
+    loop = asyncio.get_running_loop()
+    key = (api_key, base_url)
+
+    with _clients_lock:
+        clients = _async_openai_clients.get(loop)
+        if clients is None:
+            clients = _async_openai_clients[loop] = {}
+
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=_get_http_client(loop),
+                max_retries=OPENAI_MAX_RETRIES,
+                timeout=OPENAI_TIMEOUT
+            )
+
+    return client
+
+
+@atexit.register
+def _close_http_clients():
+    """进程退出时关闭仍可运行的事件循环上的连接池"""
+    with _clients_lock:
+        http_clients = list(_http_clients.items())
+        _http_clients.clear()
+        _async_openai_clients.clear()
+
+    for loop, http_client in http_clients:
+        if loop.is_closed() or loop.is_running():
+            continue
+        try:
+            loop.run_until_complete(http_client.aclose())
+        except Exception as e:
+            logger.debug(f"关闭HTTP连接池失败: {str(e)}")
+
+
+class AsyncOpenAIClientMixin:
+    """为OpenAI兼容的提供商提供按事件循环复用的异步客户端"""
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        return get_async_openai_client(self.api_key, self.base_url)
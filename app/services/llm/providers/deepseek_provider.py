@@ -4,40 +4,46 @@ DeepSeek API提供商实现
 支持DeepSeek的文本生成模型
 """
 
-import asyncio
-from typing import List, Dict, Any, Optional
-from openai import OpenAI, BadRequestError
+from typing import Dict, Any, Optional, FrozenSet
+from openai import BadRequestError
 from loguru import logger
 
-from ..base import TextModelProvider
+from ..base import TextModelProvider, JSON_FORMAT_INSTRUCTION
 from ..exceptions import APICallError
+from ._http import AsyncOpenAIClientMixin
 
 
-class DeepSeekTextProvider(TextModelProvider):
+# 支持的模型
+_SUPPORTED_MODELS = frozenset({
+    "deepseek-chat",
+    "deepseek-reasoner",
+    "deepseek-r1",
+    "deepseek-v3",
+})
+
+
+class DeepSeekTextProvider(AsyncOpenAIClientMixin, TextModelProvider):
     """DeepSeek文本生成提供商"""
     
+    # DeepSeek R1 和 V3 不支持 response_format=json_object
+    _UNSUPPORTED_RESPONSE_FORMAT_MODELS = (
+        "deepseek-reasoner",
+        "deepseek-r1",
+        "deepseek-v3",
+    )
+    
     @property
     def provider_name(self) -> str:
         return "deepseek"
     
     @property
-    def supported_models(self) -> List[str]:
-        return [
-            "deepseek-chat",
-            "deepseek-reasoner",
-            "deepseek-r1",
-            "deepseek-v3"
-        ]
+    def supported_models(self) -> FrozenSet[str]:
+        return _SUPPORTED_MODELS
     
     def _initialize(self):
         """初始化DeepSeek客户端"""
         if not self.base_url:
             self.base_url = "https://api.deepseek.com"
-        
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url
-        )
     
     async def generate_text(self,
                           prompt: str,
@@ -80,12 +86,11 @@ class DeepSeekTextProvider(TextModelProvider):
                 request_params["response_format"] = {"type": "json_object"}
             else:
                 # 对于不支持response_format的模型，在提示词中添加约束
-                messages[-1]["content"] += "\n\n请确保输出严格的JSON格式，不要包含任何其他文字或标记。"
+                messages[-1]["content"] += JSON_FORMAT_INSTRUCTION
         
         try:
             # 发送API请求
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
+            response = await self.client.chat.completions.create(
                 **request_params
             )
             
@@ -107,10 +112,9 @@ class DeepSeekTextProvider(TextModelProvider):
             if "response_format" in str(e) and response_format == "json":
                 logger.warning(f"DeepSeek模型 {self.model_name} 不支持response_format，重试不带格式约束的请求")
                 request_params.pop("response_format", None)
-                messages[-1]["content"] += "\n\n请确保输出严格的JSON格式，不要包含任何其他文字或标记。"
+                messages[-1]["content"] += JSON_FORMAT_INSTRUCTION
                 
-                response = await asyncio.to_thread(
-                    self.client.chat.completions.create,
+                response = await self.client.chat.completions.create(
                     **request_params
                 )
                 
@@ -129,28 +133,8 @@ class DeepSeekTextProvider(TextModelProvider):
     
     def _supports_response_format(self) -> bool:
         """检查模型是否支持response_format参数"""
-        # DeepSeek R1 和 V3 不支持 response_format=json_object
-        unsupported_models = [
-            "deepseek-reasoner",
-            "deepseek-r1",
-            "deepseek-v3"
-        ]
-        
-        return not any(unsupported in self.model_name.lower() for unsupported in unsupported_models)
-    
-    def _clean_json_output(self, output: str) -> str:
-        """清理JSON输出，移除markdown标记等"""
-        import re
-        
-        # 移除可能的markdown代码块标记
-        output = re.sub(r'^```json\s*', '', output, flags=re.MULTILINE)
-        output = re.sub(r'^```\s*$', '', output, flags=re.MULTILINE)
-        output = re.sub(r'^```.*$', '', output, flags=re.MULTILINE)
-        
-        # 移除前后空白字符
-        output = output.strip()
-        
-        return output
+        model_name = self.model_name.lower()
+        return not any(unsupported in model_name for unsupported in self._UNSUPPORTED_RESPONSE_FORMAT_MODELS)
     
     async def _make_api_call(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """执行API调用 - 由于使用OpenAI SDK，这个方法主要用于兼容基类"""
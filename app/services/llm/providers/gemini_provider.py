@@ -5,19 +5,146 @@
 """
 
 import asyncio
-import base64
-import io
-import requests
-from typing import List, Dict, Any, Optional, Union
+import random
+from typing import List, Dict, Any, Optional, Union, FrozenSet
 from pathlib import Path
+import httpx
 import PIL.Image
 from loguru import logger
 
 from ..base import VisionModelProvider, TextModelProvider
 from ..exceptions import APICallError, ContentFilterError
+from ._http import get_async_http_client
 
+try:
+    # orjson 序列化大体积请求体（包含多张图片的base64数据）和解析长文本响应都比标准库快数倍
+    import orjson
+except ImportError:
+    orjson = None
 
-class GeminiVisionProvider(VisionModelProvider):
+# 支持的模型
+_SUPPORTED_MODELS = frozenset({
+    "gemini-2.0-flash-lite",
+    "gemini-2.0-flash",
+    "gemini-1.5-pro",
+    "gemini-1.5-flash",
+})
+
+# 限流(429)、服务端错误(5xx)和网络错误时的最大重试次数，以及指数退避的基数和上限（秒）
+GEMINI_MAX_RETRIES = 4
+GEMINI_RETRY_BASE_DELAY = 0.5
+GEMINI_RETRY_MAX_DELAY = 30.0
+_RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# 安全过滤设置，视觉分析和文本生成共用，请求间只读复用
+_SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+# 视觉分析的系统指令和生成参数
+_VISION_SYSTEM_INSTRUCTION = {
+    "parts": [{"text": "你是一位专业的视觉内容分析师，请仔细分析图片内容并提供详细描述。"}]
+}
+_VISION_GENERATION_CONFIG = {
+    "temperature": 1.0,
+    "topK": 40,
+    "topP": 0.95,
+    "maxOutputTokens": 4000,
+    "candidateCount": 1
+}
+# 文本生成的默认生成参数，温度按请求设置
+_TEXT_GENERATION_CONFIG = {
+    "topK": 40,
+    "topP": 0.95,
+    "maxOutputTokens": 60000,
+    "candidateCount": 1
+}
+
+# 是否已记录过与Gemini接口协商的HTTP协议版本
+_http_version_logged = False
+
+
+def _encode_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """生成httpx请求体参数，安装了orjson时直接传入序列化后的字节"""
+    if orjson is not None:
+        return {"content": orjson.dumps(payload)}
+    return {"json": payload}
+
+
+def _decode_response(response) -> Dict[str, Any]:
+    """解析响应体JSON，安装了orjson时直接解析原始字节"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """计算重试等待时间：优先遵循服务端的 Retry-After，否则使用带随机抖动的指数退避"""
+    if retry_after:
+        try:
+            return min(float(retry_after), GEMINI_RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    return random.uniform(0, min(GEMINI_RETRY_MAX_DELAY, GEMINI_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _log_http_version_once(response):
+    """首次请求成功后记录实际使用的HTTP协议版本，便于确认是否启用了HTTP/2"""
+    global _http_version_logged
+    if not _http_version_logged:
+        _http_version_logged = True
+        logger.debug(f"Gemini API连接协议: {response.http_version}")
+
+
+class GeminiAPIMixin:
+    """原生Gemini视觉与文本提供商共用的初始化与API调用实现"""
+    
+    def _initialize(self):
+        """初始化Gemini特定设置"""
+        if not self.base_url:
+            self.base_url = "https://generativelanguage.googleapis.com/v1beta"
+        # 接口地址和认证头只构造一次；API密钥放在请求头中，避免随URL出现在日志和异常信息里
+        self._endpoint_url = f"{self.base_url}/models/{self.model_name}:generateContent"
+        self._auth_headers = {"x-goog-api-key": self.api_key}
+        # 共享客户端只设置 User-Agent，Content-Type 随本提供商的请求发送
+        self._request_headers = {"Content-Type": "application/json", **self._auth_headers}
+    
+    async def _make_api_call(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """执行原生Gemini API调用"""
+        # 请求体只序列化一次，重试时直接复用
+        body = _encode_payload(payload)
+        
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            try:
+                response = await get_async_http_client().post(
+                    self._endpoint_url,
+                    **body,
+                    headers=self._request_headers,
+                    timeout=120
+                )
+            except httpx.TransportError as e:
+                if attempt >= GEMINI_MAX_RETRIES:
+                    raise
+                delay = _retry_delay(attempt)
+                logger.warning(f"Gemini API网络错误，{delay:.1f}秒后第 {attempt + 1} 次重试: {str(e)}")
+                await asyncio.sleep(delay)
+                continue
+            
+            if response.status_code == 200:
+                _log_http_version_once(response)
+                return _decode_response(response)
+            
+            if response.status_code not in _RETRYABLE_STATUS_CODES or attempt >= GEMINI_MAX_RETRIES:
+                raise self._handle_api_error(response.status_code, response.text)
+            
+            delay = _retry_delay(attempt, response.headers.get("Retry-After"))
+            logger.warning(f"Gemini API返回 HTTP {response.status_code}，{delay:.1f}秒后第 {attempt + 1} 次重试")
+            await asyncio.sleep(delay)
+
+
+class GeminiVisionProvider(GeminiAPIMixin, VisionModelProvider):
     """原生Gemini视觉模型提供商"""
     
     @property
@@ -25,18 +152,8 @@ class GeminiVisionProvider(VisionModelProvider):
         return "gemini"
     
     @property
-    def supported_models(self) -> List[str]:
-        return [
-            "gemini-2.0-flash-lite",
-            "gemini-2.0-flash",
-            "gemini-1.5-pro",
-            "gemini-1.5-flash"
-        ]
-    
-    def _initialize(self):
-        """初始化Gemini特定设置"""
-        if not self.base_url:
-            self.base_url = "https://generativelanguage.googleapis.com/v1beta"
+    def supported_models(self) -> FrozenSet[str]:
+        return _SUPPORTED_MODELS
     
     async def analyze_images(self,
                            images: List[Union[str, Path, PIL.Image.Image]],
@@ -57,32 +174,20 @@ class GeminiVisionProvider(VisionModelProvider):
         """
         logger.info(f"开始分析 {len(images)} 张图片，使用原生Gemini API")
         
-        # 预处理图片
-        processed_images = self._prepare_images(images)
-        
-        # 分批处理
-        results = []
-        for i in range(0, len(processed_images), batch_size):
-            batch = processed_images[i:i + batch_size]
-            logger.info(f"处理第 {i//batch_size + 1} 批，共 {len(batch)} 张图片")
-            
-            try:
-                result = await self._analyze_batch(batch, prompt)
-                results.append(result)
-            except Exception as e:
-                logger.error(f"批次 {i//batch_size + 1} 处理失败: {str(e)}")
-                results.append(f"批次处理失败: {str(e)}")
-        
-        return results
+        # 分批预处理并发分析
+        return await self._analyze_batches(
+            images, prompt, batch_size,
+            max_concurrent_tasks=kwargs.get('max_concurrent_tasks'),
+            max_image_dim=kwargs.get('max_image_dim')
+        )
     
-    async def _analyze_batch(self, batch: List[PIL.Image.Image], prompt: str) -> str:
+    async def _analyze_batch(self, batch: List[PIL.Image.Image], prompt: str, encoded: List[str]) -> str:
         """分析一批图片"""
         # 构建请求数据
         parts = [{"text": prompt}]
         
         # 添加图片数据
-        for img in batch:
-            img_data = self._image_to_base64(img)
+        for img_data in encoded:
             parts.append({
                 "inline_data": {
                     "mime_type": "image/jpeg",
@@ -91,35 +196,10 @@ class GeminiVisionProvider(VisionModelProvider):
             })
         
         payload = {
-            "systemInstruction": {
-                "parts": [{"text": "你是一位专业的视觉内容分析师，请仔细分析图片内容并提供详细描述。"}]
-            },
+            "systemInstruction": _VISION_SYSTEM_INSTRUCTION,
             "contents": [{"parts": parts}],
-            "generationConfig": {
-                "temperature": 1.0,
-                "topK": 40,
-                "topP": 0.95,
-                "maxOutputTokens": 4000,
-                "candidateCount": 1
-            },
-            "safetySettings": [
-                {
-                    "category": "HARM_CATEGORY_HARASSMENT",
-                    "threshold": "BLOCK_NONE"
-                },
-                {
-                    "category": "HARM_CATEGORY_HATE_SPEECH", 
-                    "threshold": "BLOCK_NONE"
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_NONE"
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_NONE"
-                }
-            ]
+            "generationConfig": _VISION_GENERATION_CONFIG,
+            "safetySettings": _SAFETY_SETTINGS
         }
         
         # 发送API请求
@@ -128,34 +208,6 @@ class GeminiVisionProvider(VisionModelProvider):
         # 解析响应
         return self._parse_vision_response(response_data)
     
-    def _image_to_base64(self, img: PIL.Image.Image) -> str:
-        """将PIL图片转换为base64编码"""
-        img_buffer = io.BytesIO()
-        img.save(img_buffer, format='JPEG', quality=85)
-        img_bytes = img_buffer.getvalue()
-        return base64.b64encode(img_bytes).decode('utf-8')
-    
-    async def _make_api_call(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        """执行原生Gemini API调用"""
-        url = f"{self.base_url}/models/{self.model_name}:generateContent?key={self.api_key}"
-        
-        response = await asyncio.to_thread(
-            requests.post,
-            url,
-            json=payload,
-            headers={
-                "Content-Type": "application/json",
-                "User-Agent": "NarratoAI/1.0"
-            },
-            timeout=120
-        )
-        
-        if response.status_code != 200:
-            error = self._handle_api_error(response.status_code, response.text)
-            raise error
-        
-        return response.json()
-    
     def _parse_vision_response(self, response_data: Dict[str, Any]) -> str:
         """解析视觉分析响应"""
         if "candidates" not in response_data or not response_data["candidates"]:
@@ -171,10 +223,7 @@ class GeminiVisionProvider(VisionModelProvider):
             raise APICallError("原生Gemini API返回内容格式错误")
         
         # 提取文本内容
-        result = ""
-        for part in candidate["content"]["parts"]:
-            if "text" in part:
-                result += part["text"]
+        result = "".join(part["text"] for part in candidate["content"]["parts"] if "text" in part)
         
         if not result.strip():
             raise APICallError("原生Gemini API返回空内容")
@@ -182,7 +231,7 @@ class GeminiVisionProvider(VisionModelProvider):
         return result
 
 
-class GeminiTextProvider(TextModelProvider):
+class GeminiTextProvider(GeminiAPIMixin, TextModelProvider):
     """原生Gemini文本生成提供商"""
     
     @property
@@ -190,18 +239,8 @@ class GeminiTextProvider(TextModelProvider):
         return "gemini"
     
     @property
-    def supported_models(self) -> List[str]:
-        return [
-            "gemini-2.0-flash-lite",
-            "gemini-2.0-flash",
-            "gemini-1.5-pro",
-            "gemini-1.5-flash"
-        ]
-    
-    def _initialize(self):
-        """初始化Gemini特定设置"""
-        if not self.base_url:
-            self.base_url = "https://generativelanguage.googleapis.com/v1beta"
+    def supported_models(self) -> FrozenSet[str]:
+        return _SUPPORTED_MODELS
     
     async def generate_text(self,
                           prompt: str,
@@ -227,31 +266,8 @@ class GeminiTextProvider(TextModelProvider):
         # 构建请求数据
         payload = {
             "contents": [{"parts": [{"text": prompt}]}],
-            "generationConfig": {
-                "temperature": temperature,
-                "topK": 40,
-                "topP": 0.95,
-                "maxOutputTokens": 60000,
-                "candidateCount": 1
-            },
-            "safetySettings": [
-                {
-                    "category": "HARM_CATEGORY_HARASSMENT",
-                    "threshold": "BLOCK_NONE"
-                },
-                {
-                    "category": "HARM_CATEGORY_HATE_SPEECH",
-                    "threshold": "BLOCK_NONE"
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", 
-                    "threshold": "BLOCK_NONE"
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_NONE"
-                }
-            ]
+            "generationConfig": {"temperature": temperature, **_TEXT_GENERATION_CONFIG},
+            "safetySettings": _SAFETY_SETTINGS
         }
         
         # 添加系统提示词
@@ -277,27 +293,6 @@ class GeminiTextProvider(TextModelProvider):
         # 解析响应
         return self._parse_text_response(response_data)
     
-    async def _make_api_call(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        """执行原生Gemini API调用"""
-        url = f"{self.base_url}/models/{self.model_name}:generateContent?key={self.api_key}"
-        
-        response = await asyncio.to_thread(
-            requests.post,
-            url,
-            json=payload,
-            headers={
-                "Content-Type": "application/json",
-                "User-Agent": "NarratoAI/1.0"
-            },
-            timeout=120
-        )
-        
-        if response.status_code != 200:
-            error = self._handle_api_error(response.status_code, response.text)
-            raise error
-        
-        return response.json()
-    
     def _parse_text_response(self, response_data: Dict[str, Any]) -> str:
         """解析文本生成响应"""
         logger.debug(f"Gemini API响应数据: {response_data}")
@@ -333,10 +328,7 @@ class GeminiTextProvider(TextModelProvider):
             raise APICallError("原生Gemini API返回内容格式错误")
 
         # 提取文本内容
-        result = ""
-        for part in candidate["content"]["parts"]:
-            if "text" in part:
-                result += part["text"]
+        result = "".join(part["text"] for part in candidate["content"]["parts"] if "text" in part)
 
         if not result.strip():
             logger.error(f"Gemini API返回空文本内容，完整响应: {response_data}")
@@ -4,50 +4,55 @@ OpenAI API提供商实现
 使用OpenAI API进行文本生成，也支持OpenAI兼容的其他服务
 """
 
-import asyncio
-from typing import List, Dict, Any, Optional
-from openai import OpenAI, BadRequestError
+from typing import Dict, Any, Optional, FrozenSet
+from openai import BadRequestError
 from loguru import logger
 
-from ..base import TextModelProvider
+from ..base import TextModelProvider, JSON_FORMAT_INSTRUCTION
 from ..exceptions import APICallError, RateLimitError, AuthenticationError
+from ._http import AsyncOpenAIClientMixin
 
 
-class OpenAITextProvider(TextModelProvider):
+# 支持的模型
+_SUPPORTED_MODELS = frozenset({
+    "gpt-4o",
+    "gpt-4o-mini",
+    "gpt-4-turbo",
+    "gpt-4",
+    "gpt-3.5-turbo",
+    "gpt-3.5-turbo-16k",
+    # 支持其他OpenAI兼容模型
+    "deepseek-chat",
+    "deepseek-reasoner",
+    "qwen-plus",
+    "qwen-turbo",
+    "moonshot-v1-8k",
+    "moonshot-v1-32k",
+    "moonshot-v1-128k",
+})
+
+
+class OpenAITextProvider(AsyncOpenAIClientMixin, TextModelProvider):
     """OpenAI文本生成提供商"""
     
+    # 已知不支持response_format的模型
+    _UNSUPPORTED_RESPONSE_FORMAT_MODELS = (
+        "deepseek-reasoner",
+        "deepseek-r1",
+    )
+    
     @property
     def provider_name(self) -> str:
         return "openai"
     
     @property
-    def supported_models(self) -> List[str]:
-        return [
-            "gpt-4o",
-            "gpt-4o-mini", 
-            "gpt-4-turbo",
-            "gpt-4",
-            "gpt-3.5-turbo",
-            "gpt-3.5-turbo-16k",
-            # 支持其他OpenAI兼容模型
-            "deepseek-chat",
-            "deepseek-reasoner",
-            "qwen-plus",
-            "qwen-turbo",
-            "moonshot-v1-8k",
-            "moonshot-v1-32k",
-            "moonshot-v1-128k"
-        ]
+    def supported_models(self) -> FrozenSet[str]:
+        return _SUPPORTED_MODELS
     
     def _initialize(self):
         """初始化OpenAI客户端"""
         if not self.base_url:
             self.base_url = "https://api.openai.com/v1"
-        
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url
-        )
     
     async def generate_text(self,
                           prompt: str,
@@ -90,12 +95,11 @@ class OpenAITextProvider(TextModelProvider):
                 request_params["response_format"] = {"type": "json_object"}
             else:
                 # 对于不支持response_format的模型，在提示词中添加约束
-                messages[-1]["content"] += "\n\n请确保输出严格的JSON格式，不要包含任何其他文字或标记。"
+                messages[-1]["content"] += JSON_FORMAT_INSTRUCTION
         
         try:
             # 发送API请求
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
+            response = await self.client.chat.completions.create(
                 **request_params
             )
             
@@ -117,10 +121,9 @@ class OpenAITextProvider(TextModelProvider):
             if "response_format" in str(e) and response_format == "json":
                 logger.warning(f"模型 {self.model_name} 不支持response_format，重试不带格式约束的请求")
                 request_params.pop("response_format", None)
-                messages[-1]["content"] += "\n\n请确保输出严格的JSON格式，不要包含任何其他文字或标记。"
+                messages[-1]["content"] += JSON_FORMAT_INSTRUCTION
                 
-                response = await asyncio.to_thread(
-                    self.client.chat.completions.create,
+                response = await self.client.chat.completions.create(
                     **request_params
                 )
                 
@@ -139,27 +142,8 @@ class OpenAITextProvider(TextModelProvider):
     
     def _supports_response_format(self) -> bool:
         """检查模型是否支持response_format参数"""
-        # 已知不支持response_format的模型
-        unsupported_models = [
-            "deepseek-reasoner",
-            "deepseek-r1"
-        ]
-        
-        return not any(unsupported in self.model_name.lower() for unsupported in unsupported_models)
-    
-    def _clean_json_output(self, output: str) -> str:
-        """清理JSON输出，移除markdown标记等"""
-        import re
-        
-        # 移除可能的markdown代码块标记
-        output = re.sub(r'^```json\s*', '', output, flags=re.MULTILINE)
-        output = re.sub(r'^```\s*$', '', output, flags=re.MULTILINE)
-        output = re.sub(r'^```.*$', '', output, flags=re.MULTILINE)
-        
-        # 移除前后空白字符
-        output = output.strip()
-        
-        return output
+        model_name = self.model_name.lower()
+        return not any(unsupported in model_name for unsupported in self._UNSUPPORTED_RESPONSE_FORMAT_MODELS)
     
     async def _make_api_call(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """执行API调用 - 由于使用OpenAI SDK，这个方法主要用于兼容基类"""
@@ -4,20 +4,37 @@
 支持硅基流动的视觉模型和文本生成模型
 """
 
-import asyncio
-import base64
-import io
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, FrozenSet
 from pathlib import Path
 import PIL.Image
-from openai import OpenAI
 from loguru import logger
 
-from ..base import VisionModelProvider, TextModelProvider
+from ..base import VisionModelProvider, TextModelProvider, JSON_FORMAT_INSTRUCTION
 from ..exceptions import APICallError
+from ._http import AsyncOpenAIClientMixin
 
 
-class SiliconflowVisionProvider(VisionModelProvider):
+# 支持的视觉模型
+_SUPPORTED_VISION_MODELS = frozenset({
+    "Qwen/Qwen2.5-VL-32B-Instruct",
+    "Qwen/Qwen2-VL-72B-Instruct",
+    "deepseek-ai/deepseek-vl2",
+    "OpenGVLab/InternVL2-26B",
+})
+
+# 支持的文本模型
+_SUPPORTED_TEXT_MODELS = frozenset({
+    "deepseek-ai/DeepSeek-R1",
+    "deepseek-ai/DeepSeek-V3",
+    "Qwen/Qwen2.5-72B-Instruct",
+    "Qwen/Qwen2.5-32B-Instruct",
+    "meta-llama/Llama-3.1-70B-Instruct",
+    "meta-llama/Llama-3.1-8B-Instruct",
+    "01-ai/Yi-1.5-34B-Chat",
+})
+
+
+class SiliconflowVisionProvider(AsyncOpenAIClientMixin, VisionModelProvider):
     """硅基流动视觉模型提供商"""
     
     @property
@@ -25,23 +42,13 @@ class SiliconflowVisionProvider(VisionModelProvider):
         return "siliconflow"
     
     @property
-    def supported_models(self) -> List[str]:
-        return [
-            "Qwen/Qwen2.5-VL-32B-Instruct",
-            "Qwen/Qwen2-VL-72B-Instruct",
-            "deepseek-ai/deepseek-vl2",
-            "OpenGVLab/InternVL2-26B"
-        ]
+    def supported_models(self) -> FrozenSet[str]:
+        return _SUPPORTED_VISION_MODELS
     
     def _initialize(self):
         """初始化硅基流动客户端"""
         if not self.base_url:
             self.base_url = "https://api.siliconflow.cn/v1"
-        
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url
-        )
     
     async def analyze_images(self,
                            images: List[Union[str, Path, PIL.Image.Image]],
@@ -62,36 +69,24 @@ class SiliconflowVisionProvider(VisionModelProvider):
         """
         logger.info(f"开始分析 {len(images)} 张图片，使用硅基流动")
         
-        # 预处理图片
-        processed_images = self._prepare_images(images)
-        
-        # 分批处理
-        results = []
-        for i in range(0, len(processed_images), batch_size):
-            batch = processed_images[i:i + batch_size]
-            logger.info(f"处理第 {i//batch_size + 1} 批，共 {len(batch)} 张图片")
-            
-            try:
-                result = await self._analyze_batch(batch, prompt)
-                results.append(result)
-            except Exception as e:
-                logger.error(f"批次 {i//batch_size + 1} 处理失败: {str(e)}")
-                results.append(f"批次处理失败: {str(e)}")
-        
-        return results
+        # 分批预处理并发分析
+        return await self._analyze_batches(
+            images, prompt, batch_size,
+            max_concurrent_tasks=kwargs.get('max_concurrent_tasks'),
+            max_image_dim=kwargs.get('max_image_dim')
+        )
     
-    async def _analyze_batch(self, batch: List[PIL.Image.Image], prompt: str) -> str:
+    async def _analyze_batch(self, batch: List[PIL.Image.Image], prompt: str, encoded: List[str]) -> str:
         """分析一批图片"""
         # 构建消息内容
-        content = [{"type": "text", "text": prompt}]
+        content = [self._text_part(prompt)]
         
         # 添加图片
-        for img in batch:
-            base64_image = self._image_to_base64(img)
+        for data_url in self._to_data_urls(encoded):
             content.append({
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_image}"
+                    "url": data_url
                 }
             })
         
@@ -102,8 +97,7 @@ class SiliconflowVisionProvider(VisionModelProvider):
         }]
         
         # 调用API
-        response = await asyncio.to_thread(
-            self.client.chat.completions.create,
+        response = await self.client.chat.completions.create(
             model=self.model_name,
             messages=messages,
             max_tokens=4000,
@@ -115,46 +109,32 @@ class SiliconflowVisionProvider(VisionModelProvider):
         else:
             raise APICallError("硅基流动API返回空响应")
     
-    def _image_to_base64(self, img: PIL.Image.Image) -> str:
-        """将PIL图片转换为base64编码"""
-        img_buffer = io.BytesIO()
-        img.save(img_buffer, format='JPEG', quality=85)
-        img_bytes = img_buffer.getvalue()
-        return base64.b64encode(img_bytes).decode('utf-8')
-    
     async def _make_api_call(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """执行API调用 - 由于使用OpenAI SDK，这个方法主要用于兼容基类"""
         pass
 
 
-class SiliconflowTextProvider(TextModelProvider):
+class SiliconflowTextProvider(AsyncOpenAIClientMixin, TextModelProvider):
     """硅基流动文本生成提供商"""
     
+    # DeepSeek R1 和 V3 不支持 response_format=json_object
+    _UNSUPPORTED_RESPONSE_FORMAT_MODELS = (
+        "deepseek-ai/deepseek-r1",
+        "deepseek-ai/deepseek-v3",
+    )
+    
     @property
     def provider_name(self) -> str:
         return "siliconflow"
     
     @property
-    def supported_models(self) -> List[str]:
-        return [
-            "deepseek-ai/DeepSeek-R1",
-            "deepseek-ai/DeepSeek-V3",
-            "Qwen/Qwen2.5-72B-Instruct",
-            "Qwen/Qwen2.5-32B-Instruct",
-            "meta-llama/Llama-3.1-70B-Instruct",
-            "meta-llama/Llama-3.1-8B-Instruct",
-            "01-ai/Yi-1.5-34B-Chat"
-        ]
+    def supported_models(self) -> FrozenSet[str]:
+        return _SUPPORTED_TEXT_MODELS
     
     def _initialize(self):
         """初始化硅基流动客户端"""
         if not self.base_url:
             self.base_url = "https://api.siliconflow.cn/v1"
-        
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url
-        )
     
     async def generate_text(self,
                           prompt: str,
@@ -196,12 +176,11 @@ class SiliconflowTextProvider(TextModelProvider):
                 request_params["response_format"] = {"type": "json_object"}
             else:
                 # 对于不支持response_format的模型，在提示词中添加约束
-                messages[-1]["content"] += "\n\n请确保输出严格的JSON格式，不要包含任何其他文字或标记。"
+                messages[-1]["content"] += JSON_FORMAT_INSTRUCTION
         
         try:
             # 发送API请求
-            response = await asyncio.to_thread(
-                self.client.chat.completions.create,
+            response = await self.client.chat.completions.create(
                 **request_params
             )
             
@@ -224,27 +203,8 @@ class SiliconflowTextProvider(TextModelProvider):
     
     def _supports_response_format(self) -> bool:
         """检查模型是否支持response_format参数"""
-        # DeepSeek R1 和 V3 不支持 response_format=json_object
-        unsupported_models = [
-            "deepseek-ai/deepseek-r1",
-            "deepseek-ai/deepseek-v3"
-        ]
-        
-        return not any(unsupported in self.model_name.lower() for unsupported in unsupported_models)
-    
-    def _clean_json_output(self, output: str) -> str:
-        """清理JSON输出，移除markdown标记等"""
-        import re
-        
-        # 移除可能的markdown代码块标记
-        output = re.sub(r'^```json\s*', '', output, flags=re.MULTILINE)
-        output = re.sub(r'^```\s*$', '', output, flags=re.MULTILINE)
-        output = re.sub(r'^```.*$', '', output, flags=re.MULTILINE)
-        
-        # 移除前后空白字符
-        output = output.strip()
-        
-        return output
+        model_name = self.model_name.lower()
+        return not any(unsupported in model_name for unsupported in self._UNSUPPORTED_RESPONSE_FORMAT_MODELS)
     
     async def _make_api_call(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         """执行API调用 - 由于使用OpenAI SDK，这个方法主要用于兼容基类"""
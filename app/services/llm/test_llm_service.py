@@ -20,6 +20,7 @@ sys.path.insert(0, str(project_root))
 from app.services.llm.config_validator import LLMConfigValidator
 from app.services.llm.unified_service import UnifiedLLMService
 from app.services.llm.exceptions import LLMServiceError
+from app.services.llm.providers._http import aclose_loop_clients
 
 
 async def test_text_generation():
@@ -254,10 +255,18 @@ async def run_all_tests():
     print("="*60)
 
 
+async def main():
+    """运行测试，并在 asyncio.run 关闭事件循环前释放共享HTTP连接池"""
+    try:
+        await run_all_tests()
+    finally:
+        await aclose_loop_clients()
+
+
 if __name__ == "__main__":
     # 设置日志级别
     logger.remove()
     logger.add(sys.stderr, level="INFO")
     
     # 运行测试
-    asyncio.run(run_all_tests())
+    asyncio.run(main())
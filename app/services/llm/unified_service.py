@@ -4,29 +4,29 @@
 提供简化的API接口，方便现有代码迁移到新的架构
 """
 
-from typing import List, Dict, Any, Optional, Union
+import json
+from typing import Any, Callable, Dict, List, Optional, Union
 from pathlib import Path
 import PIL.Image
 from loguru import logger
 
+from app.config import config
 from .manager import LLMServiceManager
 from .validators import OutputValidator
 from .exceptions import LLMServiceError
+from .cache import LLMCache
+from . import providers  # noqa: F401  导入时注册所有提供商
 
-# 确保提供商已注册
-def _ensure_providers_registered():
-    """确保所有提供商都已注册"""
-    try:
-        # 检查是否有已注册的提供商
-        if not LLMServiceManager.list_text_providers() or not LLMServiceManager.list_vision_providers():
-            # 如果没有注册的提供商，强制导入providers模块
-            from . import providers
-            logger.debug("强制注册LLM服务提供商")
-    except Exception as e:
-        logger.error(f"确保LLM服务提供商注册时发生错误: {str(e)}")
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-# 在模块加载时确保提供商已注册
-_ensure_providers_registered()
+# 确定性文本生成请求的响应缓存，与视觉分析结果缓存一样默认关闭
+_response_cache = LLMCache(
+    ttl=config.app.get('llm_cache_ttl', 3600),
+    enabled=config.app.get('llm_cache_enabled', False)
+)
 
 
 class UnifiedLLMService:
@@ -80,6 +80,7 @@ class UnifiedLLMService:
                           temperature: float = 1.0,
                           max_tokens: Optional[int] = None,
                           response_format: Optional[str] = None,
+                          validator: Optional[Callable[[str], Any]] = None,
                           **kwargs) -> str:
         """
         生成文本内容
@@ -91,6 +92,7 @@ class UnifiedLLMService:
             temperature: 生成温度
             max_tokens: 最大token数
             response_format: 响应格式 ('json' 或 None)
+            validator: 输出校验函数，校验失败时抛出异常，只有通过校验的结果才会写入缓存
             **kwargs: 其他参数
             
         Returns:
@@ -103,6 +105,26 @@ class UnifiedLLMService:
             # 获取文本模型提供商
             text_provider = LLMServiceManager.get_text_provider(provider)
             
+            # 低温度请求的输出基本确定，相同请求直接复用缓存结果
+            cache_key = None
+            if _response_cache.is_cacheable(temperature, **kwargs):
+                cache_key = LLMCache.make_key({
+                    "provider": text_provider.provider_name,
+                    "model": text_provider.model_name,
+                    # 同名提供商和模型可能对应不同的OpenAI兼容接口
+                    "base_url": text_provider.base_url,
+                    "prompt": prompt,
+                    "system_prompt": system_prompt,
+                    "temperature": temperature,
+                    "max_tokens": max_tokens,
+                    "response_format": response_format,
+                    "kwargs": kwargs
+                })
+                cached = await _response_cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"文本生成命中缓存，内容长度: {len(cached)} 字符")
+                    return cached
+            
             # 执行文本生成
             result = await text_provider.generate_text(
                 prompt=prompt,
@@ -113,6 +135,12 @@ class UnifiedLLMService:
                 **kwargs
             )
             
+            if cache_key is not None:
+                # 未通过校验的结果不写入缓存，否则重试时会再次拿到同样的无效输出
+                if validator is not None:
+                    validator(result)
+                await _response_cache.set(cache_key, result)
+            
             logger.info(f"文本生成完成，生成内容长度: {len(result)} 字符")
             return result
             
@@ -149,6 +177,7 @@ class UnifiedLLMService:
                 provider=provider,
                 temperature=temperature,
                 response_format="json",
+                validator=OutputValidator.validate_narration_script if validate_output else None,
                 **kwargs
             )
             
@@ -159,8 +188,7 @@ class UnifiedLLMService:
                 return narration_items
             else:
                 # 简单的JSON解析
-                import json
-                parsed_result = json.loads(result)
+                parsed_result = orjson.loads(result) if orjson else json.loads(result)
                 if "items" in parsed_result:
                     return parsed_result["items"]
                 else:
@@ -202,6 +230,7 @@ class UnifiedLLMService:
                 system_prompt=system_prompt,
                 provider=provider,
                 temperature=temperature,
+                validator=OutputValidator.validate_subtitle_analysis if validate_output else None,
                 **kwargs
             )
             
@@ -247,6 +276,16 @@ class UnifiedLLMService:
         """
         return LLMServiceManager.list_text_providers()
     
+    @staticmethod
+    def get_response_cache_stats() -> Dict[str, Any]:
+        """
+        获取文本生成响应缓存的统计信息
+        
+        Returns:
+            包含命中次数、未命中次数和命中率的字典
+        """
+        return _response_cache.get_stats()
+    
     @staticmethod
     def clear_cache():
         """清空提供商实例缓存"""
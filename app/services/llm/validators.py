@@ -11,6 +11,12 @@ from loguru import logger
 
 from .exceptions import ValidationError
 
+try:
+    # orjson.JSONDecodeError 继承自 json.JSONDecodeError，异常处理无需区分
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class OutputValidator:
     """输出格式验证器"""
@@ -35,7 +41,7 @@ class OutputValidator:
             cleaned_output = OutputValidator._clean_json_output(output)
             
             # 解析JSON
-            parsed_json = json.loads(cleaned_output)
+            parsed_json = orjson.loads(cleaned_output) if orjson else json.loads(cleaned_output)
             
             # 如果提供了schema，进行schema验证
             if schema:
@@ -164,12 +164,23 @@ def save_video(video_url: str, save_dir: str = "") -> str:
         return video_path
 
     # if video does not exist, download it
-    with open(video_path, "wb") as f:
-        f.write(
-            requests.get(
-                video_url, proxies=config.proxy, verify=False, timeout=(60, 240)
-            ).content
-        )
+    # 先写入临时文件再原子替换，中断的下载不会在下次被当作已缓存的视频
+    tmp_path = f"{video_path}.part"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(
+                requests.get(
+                    video_url, proxies=config.proxy, verify=False, timeout=(60, 240)
+                ).content
+            )
+        os.replace(tmp_path, video_path)
+    except Exception:
+        # 下载或写入失败时删除临时文件，避免缓存目录中残留
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
 
     if os.path.exists(video_path) and os.path.getsize(video_path) > 0:
         try:
@@ -11,13 +11,21 @@
 import os
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from functools import lru_cache
 from typing import List, Optional, Tuple
 from loguru import logger
 
 from app.utils import ffmpeg_utils
 
 
+# 合并前并行转码的片段数上限：软件编码时 libx264 自身也是多线程，按CPU核数的一半并行；
+# 消费级显卡的硬件编码器同时会话数有限，硬件加速时只并行两个
+MAX_PARALLEL_TRANSCODES = max(1, (os.cpu_count() or 2) // 2)
+MAX_PARALLEL_HWACCEL_TRANSCODES = 2
+
+
 class VideoAspect(Enum):
     """视频宽高比枚举"""
     landscape = "16:9"  # 横屏 16:9
@@ -49,12 +57,8 @@ def check_ffmpeg_installation() -> bool:
     Returns:
         bool: 如果安装则返回True，否则返回False
     """
-    try:
-        subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        return True
-    except (subprocess.SubprocessError, FileNotFoundError):
-        logger.error("ffmpeg未安装或不在系统PATH中，请安装ffmpeg")
-        return False
+    # 复用 ffmpeg_utils 中带缓存的检测，避免每次合并都启动子进程
+    return ffmpeg_utils.check_ffmpeg_installation()
 
 
 def get_hardware_acceleration_option() -> Optional[str]:
@@ -68,20 +72,20 @@ def get_hardware_acceleration_option() -> Optional[str]:
     return ffmpeg_utils.get_ffmpeg_hwaccel_type()
 
 
-def check_video_has_audio(video_path: str) -> bool:
+@lru_cache(maxsize=128)
+def _probe_video_has_audio(video_path: str, mtime_ns: int, size: int) -> bool:
     """
-    检查视频是否包含音频流
+    用ffprobe检测视频是否包含音频流，按文件路径、修改时间和大小缓存结果，
+    文件被重新生成后会自动重新检测
 
     Args:
         video_path: 视频文件路径
+        mtime_ns: 文件修改时间（纳秒），仅用作缓存键
+        size: 文件大小，仅用作缓存键
 
     Returns:
         bool: 如果视频包含音频流则返回True，否则返回False
     """
-    if not os.path.exists(video_path):
-        logger.warning(f"视频文件不存在: {video_path}")
-        return False
-
     probe_cmd = [
         'ffprobe', '-v', 'error',
         '-select_streams', 'a:0',
@@ -98,6 +102,25 @@ def check_video_has_audio(video_path: str) -> bool:
         return False
 
 
+def check_video_has_audio(video_path: str) -> bool:
+    """
+    检查视频是否包含音频流
+
+    Args:
+        video_path: 视频文件路径
+
+    Returns:
+        bool: 如果视频包含音频流则返回True，否则返回False
+    """
+    if not os.path.exists(video_path):
+        logger.warning(f"视频文件不存在: {video_path}")
+        return False
+
+    # combine_clip_videos 和 process_single_video 会先后检测同一个片段，缓存后只需探测一次
+    stat = os.stat(video_path)
+    return _probe_video_has_audio(video_path, stat.st_mtime_ns, stat.st_size)
+
+
 def create_ffmpeg_concat_file(video_paths: List[str], concat_file_path: str) -> str:
     """
     创建ffmpeg合并所需的concat文件
@@ -325,6 +348,71 @@ def process_single_video(
         raise RuntimeError(f"处理视频失败: {error_msg}")
 
 
+def _process_segment(
+        segment: dict,
+        temp_dir: str,
+        video_width: int,
+        video_height: int,
+        hwaccel: Optional[str],
+        force_software_encoding: bool,
+        total: int
+) -> Optional[dict]:
+    """
+    将单个视频片段处理为统一分辨率和帧率的中间文件，硬件编码失败时降级为软件编码
+
+    Args:
+        segment: 视频片段配置
+        temp_dir: 中间文件目录
+        video_width: 目标宽度
+        video_height: 目标高度
+        hwaccel: 硬件加速选项
+        force_software_encoding: 是否强制使用软件编码
+        total: 片段总数，用于日志
+
+    Returns:
+        Optional[dict]: 处理后的片段信息，失败时返回None
+    """
+    # 处理单个视频，去除或保留音频
+    temp_output = os.path.join(temp_dir, f"processed_{segment['index']}.mp4")
+    processed = {
+        "index": segment["index"],
+        "path": temp_output,
+        "keep_audio": segment["keep_audio"]
+    }
+    try:
+        process_single_video(
+            input_path=segment['path'],
+            output_path=temp_output,
+            target_width=video_width,
+            target_height=video_height,
+            keep_audio=segment['keep_audio'],
+            hwaccel=hwaccel
+        )
+        logger.info(f"视频 {segment['index'] + 1}/{total} 处理完成")
+        return processed
+    except Exception as e:
+        logger.error(f"处理视频 {segment['path']} 时出错: {str(e)}")
+        # 如果使用硬件加速失败，尝试使用软件编码
+        if not hwaccel or force_software_encoding:
+            return None
+
+    logger.info(f"尝试使用软件编码处理视频 {segment['path']}")
+    try:
+        process_single_video(
+            input_path=segment['path'],
+            output_path=temp_output,
+            target_width=video_width,
+            target_height=video_height,
+            keep_audio=segment['keep_audio'],
+            hwaccel=None  # 使用软件编码
+        )
+        logger.info(f"使用软件编码成功处理视频 {segment['index'] + 1}/{total}")
+        return processed
+    except Exception as fallback_error:
+        logger.error(f"使用软件编码处理视频 {segment['path']} 也失败: {str(fallback_error)}")
+        return None
+
+
 def combine_clip_videos(
         output_video_path: str,
         video_paths: List[str],
@@ -413,50 +501,29 @@ def combine_clip_videos(
     os.makedirs(temp_dir, exist_ok=True)
 
     try:
-        # 第一阶段：处理所有视频片段到中间文件
-        for segment in video_segments:
-            # 处理单个视频，去除或保留音频
-            temp_output = os.path.join(temp_dir, f"processed_{segment['index']}.mp4")
-            try:
-                process_single_video(
-                    input_path=segment['path'],
-                    output_path=temp_output,
-                    target_width=video_width,
-                    target_height=video_height,
-                    keep_audio=segment['keep_audio'],
-                    hwaccel=hwaccel
+        # 第一阶段：并行处理所有视频片段到中间文件，每个片段是独立的ffmpeg子进程
+        max_workers = min(
+            MAX_PARALLEL_HWACCEL_TRANSCODES if hwaccel else MAX_PARALLEL_TRANSCODES,
+            max(1, len(video_segments))
+        )
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcode") as executor:
+            futures = [
+                executor.submit(
+                    _process_segment,
+                    segment,
+                    temp_dir,
+                    video_width,
+                    video_height,
+                    hwaccel,
+                    force_software_encoding,
+                    len(video_segments)
                 )
-                processed_videos.append({
-                    "index": segment["index"],
-                    "path": temp_output,
-                    "keep_audio": segment["keep_audio"]
-                })
-                logger.info(f"视频 {segment['index'] + 1}/{len(video_segments)} 处理完成")
-            except Exception as e:
-                logger.error(f"处理视频 {segment['path']} 时出错: {str(e)}")
-                # 如果使用硬件加速失败，尝试使用软件编码
-                if hwaccel and not force_software_encoding:
-                    logger.info(f"尝试使用软件编码处理视频 {segment['path']}")
-                    try:
-                        process_single_video(
-                            input_path=segment['path'],
-                            output_path=temp_output,
-                            target_width=video_width,
-                            target_height=video_height,
-                            keep_audio=segment['keep_audio'],
-                            hwaccel=None  # 使用软件编码
-                        )
-                        processed_videos.append({
-                            "index": segment["index"],
-                            "path": temp_output,
-                            "keep_audio": segment["keep_audio"]
-                        })
-                        logger.info(f"使用软件编码成功处理视频 {segment['index'] + 1}/{len(video_segments)}")
-                    except Exception as fallback_error:
-                        logger.error(f"使用软件编码处理视频 {segment['path']} 也失败: {str(fallback_error)}")
-                        continue
-                else:
-                    continue
+                for segment in video_segments
+            ]
+            for future in futures:
+                processed = future.result()
+                if processed is not None:
+                    processed_videos.append(processed)
 
         if not processed_videos:
             raise ValueError("没有有效的视频片段可以合并")
@@ -506,11 +573,11 @@ def combine_clip_videos(
                 # 提取音频
                 audio_file = os.path.join(temp_dir, f"audio_{i}.aac")
                 extract_audio_cmd = [
-                    'ffmpeg', '-y',
+                    'ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error', '-y',
+                    '-threads', str(threads),
                     '-i', segment["path"],
                     '-vn',  # 不包含视频
-                    '-c:a', 'aac',
-                    '-b:a', '128k',
+                    '-c:a', 'copy',  # process_single_video 已将音频编码为AAC，直接复制音频流无需重新编码
                     audio_file
                 ]
                 subprocess.run(extract_audio_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
@@ -584,8 +651,9 @@ def combine_clip_videos(
 
             mixed_audio = os.path.join(temp_dir, "mixed_audio.aac")
             audio_mix_cmd = [
-                'ffmpeg', '-y'
+                'ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error', '-y'
             ] + audio_inputs + [
+                '-filter_complex_threads', str(threads),
                 '-filter_complex_script', filter_script,
                 '-map', '[aout]',
                 '-c:a', 'aac',
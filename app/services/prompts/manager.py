@@ -9,6 +9,7 @@
 @Description: 提示词管理器
 """
 
+from functools import lru_cache
 from typing import Dict, Any, List, Optional, Union
 from loguru import logger
 
@@ -23,6 +24,12 @@ from .exceptions import (
 )
 
 
+@lru_cache(maxsize=64)
+def _render_static(prompt_obj: BasePrompt) -> str:
+    """渲染无参数的提示词，按提示词对象缓存结果"""
+    return prompt_obj.render({})
+
+
 class PromptManager:
     """提示词管理器 - 统一的提示词管理接口"""
     
@@ -52,7 +59,11 @@ class PromptManager:
         prompt_obj = instance._registry.get(category, name, version)
         
         try:
-            rendered = prompt_obj.render(parameters)
+            if parameters:
+                rendered = prompt_obj.render(parameters)
+            else:
+                # 无参数的静态提示词渲染结果固定，直接复用缓存
+                rendered = _render_static(prompt_obj)
             logger.debug(f"提示词渲染成功: {category}.{name}-{prompt_obj.version}")
             return rendered
         except Exception as e:
@@ -273,6 +273,8 @@ class ScriptGenerator:
         # 打包关键帧
         progress_callback(30, "正在打包关键帧...")
         zip_path = os.path.join(temp_dir, f"keyframes_{int(time.time())}.zip")
+        # 上传和轮询任务状态都请求同一服务，共用会话以复用长连接
+        session = requests.Session()
         
         try:
             if not utils.create_zip(keyframe_files, zip_path):
@@ -285,10 +287,10 @@ class ScriptGenerator:
             if not api_key:
                 raise ValueError("未配置 Narrato API Key")
             
-            headers = {
+            session.headers.update({
                 'X-API-Key': api_key,
                 'accept': 'application/json'
-            }
+            })
             
             api_params = {
                 'batch_size': vision_batch_size,
@@ -304,9 +306,8 @@ class ScriptGenerator:
             progress_callback(40, "正在上传文件...")
             with open(zip_path, 'rb') as f:
                 files = {'file': (os.path.basename(zip_path), f, 'application/x-zip-compressed')}
-                response = requests.post(
+                response = session.post(
                     f"{api_url}/video/analyze",
-                    headers=headers, 
                     params=api_params, 
                     files=files,
                     timeout=30
@@ -324,9 +325,8 @@ class ScriptGenerator:
             
             while retry_count < max_retries:
                 try:
-                    status_response = requests.get(
+                    status_response = session.get(
                         f"{api_url}/video/tasks/{task_id}",
-                        headers=headers,
                         timeout=10
                     )
                     status_response.raise_for_status()
@@ -349,6 +349,7 @@ class ScriptGenerator:
             raise Exception("任务执行超时")
             
         finally:
+            session.close()
             # 清理临时文件
             try:
                 if os.path.exists(zip_path):
@@ -69,8 +69,10 @@ class RedisState(BaseState):
             **kwargs,
         }
 
-        for field, value in fields.items():
-            self._redis.hset(task_id, field, str(value))
+        # write all fields in a single HSET round-trip instead of one per field
+        self._redis.hset(
+            task_id, mapping={field: str(value) for field, value in fields.items()}
+        )
 
     def get_task(self, task_id: str):
         task_data = self._redis.hgetall(task_id)
@@ -19,6 +19,8 @@ device = config.whisper.get("device", "cpu")
 compute_type = config.whisper.get("compute_type", "int8")
 model = None
 
+_SRT_TIME_RE = re.compile(r"([0-9]*:[0-9]*:[0-9]*,[0-9]*)")
+
 
 def create(audio_file, subtitle_file: str = ""):
     """
@@ -213,7 +215,7 @@ def file_to_subtitles(filename):
     index = 0
     with open(filename, "r", encoding="utf-8") as f:
         for line in f:
-            times = re.findall("([0-9]*:[0-9]*:[0-9]*,[0-9]*)", line)
+            times = _SRT_TIME_RE.findall(line)
             if times:
                 current_times = line
             elif line.strip() == "" and current_times:
@@ -12,6 +12,9 @@ import re
 import os
 from datetime import datetime, timedelta
 
+_BLOCK_SEPARATOR_RE = re.compile(r'\n\s*\n')
+_ONE_MILLISECOND = timedelta(milliseconds=1)
+
 
 def parse_time(time_str):
     """解析时间字符串为timedelta对象"""
@@ -29,12 +32,10 @@ def parse_time(time_str):
 
 def format_time(td):
     """将timedelta对象格式化为SRT时间字符串"""
-    total_seconds = int(td.total_seconds())
-    hours = total_seconds // 3600
-    minutes = (total_seconds % 3600) // 60
-    seconds = total_seconds % 60
-    milliseconds = td.microseconds // 1000
-    
+    total_seconds, milliseconds = divmod(td // _ONE_MILLISECOND, 1000)
+    total_minutes, seconds = divmod(total_seconds, 60)
+    hours, minutes = divmod(total_minutes, 60)
+
     return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
 
 
@@ -59,24 +60,18 @@ def parse_edited_time_range(time_range_str):
     return start_time, end_time
 
 
-def merge_subtitle_files(subtitle_items, output_file=None):
+def iter_merged_subtitle_blocks(sorted_items):
     """
-    合并多个SRT字幕文件
-    
+    逐个生成合并后的SRT字幕块
+
     参数:
-        subtitle_items: 字典列表，每个字典包含subtitle文件路径和editedTimeRange
-        output_file: 输出文件的路径，如果为None则自动生成
-    
+        sorted_items: 已按editedTimeRange开始时间排序的字幕项列表
+
     返回:
-        合并后的字幕文件路径
+        字幕块字符串生成器，字幕序号从1开始连续编号
     """
-    # 按照editedTimeRange的开始时间排序
-    sorted_items = sorted(subtitle_items, 
-                         key=lambda x: parse_edited_time_range(x.get('editedTimeRange', ''))[0] or timedelta())
-    
-    merged_subtitles = []
     subtitle_index = 1
-    
+
     for item in sorted_items:
         if not item.get('subtitle') or not os.path.exists(item.get('subtitle')):
             continue
@@ -92,7 +87,7 @@ def merge_subtitle_files(subtitle_items, output_file=None):
             content = file.read()
             
         # 解析字幕文件
-        subtitle_blocks = re.split(r'\n\s*\n', content.strip())
+        subtitle_blocks = _BLOCK_SEPARATOR_RE.split(content.strip())
         
         for block in subtitle_blocks:
             lines = block.strip().split('\n')
@@ -113,17 +108,25 @@ def merge_subtitle_files(subtitle_items, output_file=None):
             adjusted_end_time = end_time + offset_time
             
             # 重建字幕块
-            adjusted_time_line = f"{format_time(adjusted_start_time)} --> {format_time(adjusted_end_time)}"
-            text_lines = lines[2:]
-            
-            new_block = [
-                str(subtitle_index),
-                adjusted_time_line,
-                *text_lines
-            ]
-            
-            merged_subtitles.append('\n'.join(new_block))
+            text = '\n'.join(lines[2:])
+            yield f"{subtitle_index}\n{format_time(adjusted_start_time)} --> {format_time(adjusted_end_time)}\n{text}"
             subtitle_index += 1
+
+
+def merge_subtitle_files(subtitle_items, output_file=None):
+    """
+    合并多个SRT字幕文件
+    
+    参数:
+        subtitle_items: 字典列表，每个字典包含subtitle文件路径和editedTimeRange
+        output_file: 输出文件的路径，如果为None则自动生成
+    
+    返回:
+        合并后的字幕文件路径
+    """
+    # 按照editedTimeRange的开始时间排序
+    sorted_items = sorted(subtitle_items, 
+                         key=lambda x: parse_edited_time_range(x.get('editedTimeRange', ''))[0] or timedelta())
     
     # 确定输出文件路径
     if output_file is None:
@@ -139,12 +142,12 @@ def merge_subtitle_files(subtitle_items, output_file=None):
         
         output_file = os.path.join(dir_path, f"merged_subtitle_{first_start_str}-{last_end_str}.srt")
     
-    # 合并所有字幕块
-    merged_content = '\n\n'.join(merged_subtitles)
-    
-    # 写入合并后的内容
+    # 逐块写入合并后的内容，避免在内存中拼接整份字幕
     with open(output_file, 'w', encoding='utf-8') as file:
-        file.write(merged_content)
+        for i, block in enumerate(iter_merged_subtitle_blocks(sorted_items)):
+            if i:
+                file.write('\n\n')
+            file.write(block)
     
     return output_file
 
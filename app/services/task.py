@@ -1,9 +1,13 @@
 import math
 import json
 import os.path
-import re
+import queue
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from os import path
+from typing import Optional, Tuple
 from loguru import logger
 
 from app.config import config
@@ -14,6 +18,12 @@ from app.services import (voice, audio_merger, subtitle_merger, clip_video, merg
 from app.services import state as sm
 from app.utils import utils
 
+try:
+    # orjson 直接解析字节，长脚本时比标准库更快
+    import orjson
+except ImportError:
+    orjson = None
+
 
 def start_subclip(task_id: str, params: VideoClipParams, subclip_path_videos: dict):
     """
@@ -27,6 +37,7 @@ def start_subclip(task_id: str, params: VideoClipParams, subclip_path_videos: di
 
     logger.info(f"\n\n## 开始任务: {task_id}")
     sm.state.update_task(task_id, state=const.TASK_STATE_PROCESSING, progress=0)
+    task_dir = utils.task_dir(task_id)
 
     """
     1. 加载剪辑脚本
@@ -36,11 +47,14 @@ def start_subclip(task_id: str, params: VideoClipParams, subclip_path_videos: di
     
     if path.exists(video_script_path):
         try:
-            with open(video_script_path, "r", encoding="utf-8") as f:
-                list_script = json.load(f)
-                video_list = [i['narration'] for i in list_script]
-                video_ost = [i['OST'] for i in list_script]
-                time_list = [i['timestamp'] for i in list_script]
+            with open(video_script_path, "rb") as f:
+                list_script = orjson.loads(f.read()) if orjson is not None else json.load(f)
+                # 一次遍历取出解说、OST和时间戳
+                video_list, video_ost, time_list = [], [], []
+                for i in list_script:
+                    video_list.append(i['narration'])
+                    video_ost.append(i['OST'])
+                    time_list.append(i['timestamp'])
 
                 video_script = " ".join(video_list)
                 logger.debug(f"解说完整脚本: \n{video_script}")
@@ -64,15 +78,9 @@ def start_subclip(task_id: str, params: VideoClipParams, subclip_path_videos: di
     ]
     logger.debug(f"需要生成TTS的片段数: {len(tts_segments)}")
 
-    tts_results = voice.tts_multiple(
-        task_id=task_id,
-        list_script=tts_segments,  # 只传入需要TTS的片段
-        voice_name=params.voice_name,
-        voice_rate=params.voice_rate,
-        voice_pitch=params.voice_pitch,
-    )
-
-    sm.state.update_task(task_id, state=const.TASK_STATE_PROCESSING, progress=20)
+    # 配音与裁剪并行执行，在开始配音前先确认原视频存在，避免裁剪失败时白白合成全部音频
+    if not path.exists(params.video_origin_path):
+        raise FileNotFoundError(f"视频文件不存在: {params.video_origin_path}")
 
     # """
     # 3. (可选) 使用 whisper 生成字幕
@@ -95,66 +103,102 @@ def start_subclip(task_id: str, params: VideoClipParams, subclip_path_videos: di
 
     """
     3. 裁剪视频 - 将超出音频长度的视频进行裁剪
+    配音在后台线程中逐段生成，每完成一段即交给裁剪，合成与裁剪交叠执行
     """
+    tts_queue = queue.Queue()
+    tts_results = []
+    # 裁剪出错时通知配音线程停止，不再等待剩余片段合成完毕
+    tts_stop = threading.Event()
+
+    def produce_tts():
+        tts_iter = voice.iter_tts_multiple(
+            task_id=task_id,
+            list_script=tts_segments,  # 只传入需要TTS的片段
+            voice_name=params.voice_name,
+            voice_rate=params.voice_rate,
+            voice_pitch=params.voice_pitch,
+        )
+        try:
+            for tts_result in tts_iter:
+                if tts_stop.is_set():
+                    logger.warning("视频裁剪失败，停止生成剩余配音")
+                    return
+                tts_queue.put(tts_result)
+            sm.state.update_task(task_id, state=const.TASK_STATE_PROCESSING, progress=20)
+        finally:
+            # 关闭生成器以取消尚未开始的配音请求
+            tts_iter.close()
+            # 无论成功与否都发送结束标记，避免裁剪端一直等待
+            tts_queue.put(None)
+
+    def consume_tts():
+        while True:
+            tts_result = tts_queue.get()
+            if tts_result is None:
+                return
+            tts_results.append(tts_result)
+            yield tts_result
+
     logger.info("\n\n## 3. 裁剪视频")
-    video_clip_result = clip_video.clip_video(params.video_origin_path, tts_results)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"tts-{task_id}") as executor:
+        tts_future = executor.submit(produce_tts)
+        try:
+            video_clip_result = clip_video.clip_video_incremental(
+                params.video_origin_path,
+                consume_tts(),
+                clip_video.get_clip_output_dir(task_id),
+                total_clips=len(tts_segments)
+            )
+        except BaseException:
+            tts_stop.set()
+            raise
+        tts_future.result()
+
     # 更新 list_script 中的时间戳
-    tts_clip_result = {tts_result['_id']: tts_result['audio_file'] for tts_result in tts_results}
-    subclip_clip_result = {
-        tts_result['_id']: tts_result['subtitle_file'] for tts_result in tts_results
-    }
+    tts_clip_result = {}
+    subclip_clip_result = {}
+    for tts_result in tts_results:
+        tts_clip_result[tts_result['_id']] = tts_result['audio_file']
+        subclip_clip_result[tts_result['_id']] = tts_result['subtitle_file']
     new_script_list = update_script.update_script_timestamps(list_script, video_clip_result, tts_clip_result, subclip_clip_result)
 
     sm.state.update_task(task_id, state=const.TASK_STATE_PROCESSING, progress=60)
 
     """
-    4. 合并音频和字幕
-    """
-    logger.info("\n\n## 4. 合并音频和字幕")
-    total_duration = sum([script["duration"] for script in new_script_list])
-    if tts_segments:
-        try:
-            # 合并音频文件
-            merged_audio_path = audio_merger.merge_audio_files(
-                task_id=task_id,
-                total_duration=total_duration,
-                list_script=new_script_list
-            )
-            logger.info(f"音频文件合并成功->{merged_audio_path}")
-            # 合并字幕文件
-            merged_subtitle_path = subtitle_merger.merge_subtitle_files(new_script_list)
-            logger.info(f"字幕文件合并成功->{merged_subtitle_path}")
-        except Exception as e:
-            logger.error(f"合并音频文件失败: {str(e)}")
-    else:
-        logger.warning("没有需要合并的音频/字幕")
-        merged_audio_path = ""
-        merged_subtitle_path = ""
-
-    """
-    5. 合并视频
+    4. 合并音频和字幕 & 5. 合并视频
+    音频/字幕合并与视频拼接都只依赖更新后的脚本，互不依赖，放到线程中并行执行
     """
     final_video_paths = []
     combined_video_paths = []
 
-    combined_video_path = path.join(utils.task_dir(task_id), f"merger.mp4")
-    logger.info(f"\n\n## 5. 合并视频: => {combined_video_path}")
+    combined_video_path = path.join(task_dir, f"merger.mp4")
     # 如果 new_script_list 中没有 video，则使用 subclip_path_videos 中的视频
     video_clips = [new_script['video'] if new_script.get('video') else subclip_path_videos.get(new_script.get('_id', '')) for new_script in new_script_list]
 
-    merger_video.combine_clip_videos(
-        output_video_path=combined_video_path,
-        video_paths=video_clips,
-        video_ost_list=video_ost,
-        video_aspect=params.video_aspect,
-        threads=params.n_threads
-    )
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix=f"task-{task_id}") as executor:
+        logger.info("\n\n## 4. 合并音频和字幕")
+        merge_audio_future = executor.submit(_merge_audio_and_subtitles, task_id, new_script_list, bool(tts_segments))
+
+        logger.info(f"\n\n## 5. 合并视频: => {combined_video_path}")
+        combine_video_future = executor.submit(
+            merger_video.combine_clip_videos,
+            output_video_path=combined_video_path,
+            video_paths=video_clips,
+            video_ost_list=video_ost,
+            video_aspect=params.video_aspect,
+            threads=params.n_threads
+        )
+
+        merged_paths = merge_audio_future.result()
+        if merged_paths is not None:
+            merged_audio_path, merged_subtitle_path = merged_paths
+        combine_video_future.result()
     sm.state.update_task(task_id, state=const.TASK_STATE_PROCESSING, progress=80)
 
     """
     6. 合并字幕/BGM/配音/视频
     """
-    output_video_path = path.join(utils.task_dir(task_id), f"combined.mp4")
+    output_video_path = path.join(task_dir, f"combined.mp4")
     logger.info(f"\n\n## 6. 最后一步: 合并字幕/BGM/配音/视频 -> {output_video_path}")
 
     # bgm_path = '/Users/apple/Desktop/home/NarratoAI/resource/songs/bgm.mp3'
@@ -208,6 +252,39 @@ def start_subclip(task_id: str, params: VideoClipParams, subclip_path_videos: di
     return kwargs
 
 
+def _merge_audio_and_subtitles(task_id: str, new_script_list: list, has_tts_segments: bool) -> Optional[Tuple[str, str]]:
+    """
+    合并配音音频和字幕文件
+    Args:
+        task_id: 任务ID
+        new_script_list: 更新时间戳后的脚本列表
+        has_tts_segments: 是否存在需要配音的片段
+
+    Returns:
+        (合并后的音频路径, 合并后的字幕路径)，合并失败时返回 None
+    """
+    if not has_tts_segments:
+        logger.warning("没有需要合并的音频/字幕")
+        return "", ""
+
+    total_duration = math.fsum(map(itemgetter("duration"), new_script_list))
+    try:
+        # 合并音频文件
+        merged_audio_path = audio_merger.merge_audio_files(
+            task_id=task_id,
+            total_duration=total_duration,
+            list_script=new_script_list
+        )
+        logger.info(f"音频文件合并成功->{merged_audio_path}")
+        # 合并字幕文件
+        merged_subtitle_path = subtitle_merger.merge_subtitle_files(new_script_list)
+        logger.info(f"字幕文件合并成功->{merged_subtitle_path}")
+        return merged_audio_path, merged_subtitle_path
+    except Exception as e:
+        logger.error(f"合并音频文件失败: {str(e)}")
+        return None
+
+
 def validate_params(video_path, audio_path, output_file, params):
     """
     验证输入参数
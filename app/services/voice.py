@@ -1,3 +1,4 @@
+import io
 import os
 import re
 import json
@@ -5,22 +6,49 @@ import traceback
 import edge_tts
 import asyncio
 from loguru import logger
-from typing import List, Union
+from typing import Iterator, List, Union
 from datetime import datetime
 from xml.sax.saxutils import unescape
 from edge_tts import submaker, SubMaker
 from edge_tts.submaker import mktimestamp
 from moviepy.video.tools import subtitles
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from app.config import config
 from app.utils import utils
 
+try:
+    # Azure 语音SDK仅 V2 语音需要，未安装时在调用 azure_tts_v2 时报错
+    import azure.cognitiveservices.speech as speechsdk
+except ImportError:
+    speechsdk = None
 
-def get_all_azure_voices(filter_locals=None) -> list[str]:
-    if filter_locals is None:
-        filter_locals = ["zh-CN", "en-US", "zh-HK", "zh-TW", "vi-VN"]
-    voices_str = """
+try:
+    # 安装了 uvloop（不支持Windows）时用它驱动 edge_tts 的websocket流，降低每个回调的开销
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# 多段配音同时进行的TTS请求数上限，可通过 config.app.tts_max_concurrency 调整
+TTS_MAX_CONCURRENCY = 4
+
+# 共享的TTS线程池，多个任务同时配音时也不会超过并发上限
+_tts_executor: Union[ThreadPoolExecutor, None] = None
+_tts_executor_lock = threading.Lock()
+# 所有TTS请求共用一个在后台线程中常驻运行的事件循环，无需每次调用 asyncio.run 新建和关闭；
+# Streamlit 每次运行脚本都在新线程中，按线程创建事件循环会不断泄漏
+_tts_loop: Union[asyncio.AbstractEventLoop, None] = None
+_tts_loop_lock = threading.Lock()
+
+# 字幕逐行匹配时用于去除标点的正则
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_NON_WORD_RE = re.compile(r"\W+")
+
+
+# 全部可用的Azure/Edge语音，"Name"/"Gender"成对出现
+_AZURE_VOICES_STR = """
 Name: af-ZA-AdriNeural
 Gender: Female
 
@@ -994,6 +1022,10 @@ Gender: Female
 Name: zh-CN-YunxiNeural-V2
 Gender: Male
     """.strip()
+
+
+def _parse_azure_voices(voices_str: str) -> tuple:
+    """解析语音列表字符串，返回按名称排序的 (小写名称, "名称-性别") 元组"""
     voices = []
     name = ""
     for line in voices_str.split("\n"):
@@ -1005,19 +1037,23 @@ Gender: Male
         if line.startswith("Gender: "):
             gender = line[8:].strip()
             if name and gender:
-                # voices.append({
-                #     "name": name,
-                #     "gender": gender,
-                # })
-                if filter_locals:
-                    for filter_local in filter_locals:
-                        if name.lower().startswith(filter_local.lower()):
-                            voices.append(f"{name}-{gender}")
-                else:
-                    voices.append(f"{name}-{gender}")
+                voices.append((name.lower(), f"{name}-{gender}"))
                 name = ""
-    voices.sort()
-    return voices
+    voices.sort(key=lambda voice: voice[1])
+    return tuple(voices)
+
+
+# 模块加载时解析一次，之后每次获取语音列表只需按语言过滤
+_ALL_AZURE_VOICES = _parse_azure_voices(_AZURE_VOICES_STR)
+
+
+def get_all_azure_voices(filter_locals=None) -> list[str]:
+    if filter_locals is None:
+        filter_locals = ["zh-CN", "en-US", "zh-HK", "zh-TW", "vi-VN"]
+    if not filter_locals:
+        return [voice for _, voice in _ALL_AZURE_VOICES]
+    prefixes = tuple(filter_local.lower() for filter_local in filter_locals)
+    return [voice for name, voice in _ALL_AZURE_VOICES if name.startswith(prefixes)]
 
 
 def parse_voice_name(name: str):
@@ -1035,6 +1071,31 @@ def is_azure_v2_voice(voice_name: str):
     return ""
 
 
+def _get_tts_loop() -> asyncio.AbstractEventLoop:
+    """获取TTS共用的后台事件循环，首次调用时启动"""
+    global _tts_loop
+    with _tts_loop_lock:
+        if _tts_loop is None:
+            loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="tts-loop", daemon=True).start()
+            _tts_loop = loop
+    return _tts_loop
+
+
+def _run_async(coro):
+    """在共用的后台事件循环中运行协程，阻塞等待并返回结果"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_tts_loop()).result()
+
+
+def _remove_partial_file(file_path: str):
+    """删除生成失败时残留的不完整音频文件"""
+    try:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    except OSError as e:
+        logger.warning(f"删除不完整的音频文件失败: {file_path}, {str(e)}")
+
+
 def tts(
     text: str, voice_name: str, voice_rate: float, voice_pitch: float, voice_file: str
 ) -> Union[SubMaker, None]:
@@ -1074,36 +1135,38 @@ def azure_tts_v1(
         try:
             logger.info(f"第 {i+1} 次使用 edge_tts 生成音频")
 
-            async def _do() -> tuple[SubMaker, bytes]:
+            async def _do() -> tuple[SubMaker, int]:
                 communicate = edge_tts.Communicate(text, voice_name, rate=rate_str, pitch=pitch_str, proxy=config.proxy.get("http"))
                 sub_maker = edge_tts.SubMaker()
-                audio_data = bytes()  # 用于存储音频数据
+                audio_size = 0  # 已写入的音频字节数
                 
-                async for chunk in communicate.stream():
-                    if chunk["type"] == "audio":
-                        audio_data += chunk["data"]
-                    elif chunk["type"] == "WordBoundary":
-                        sub_maker.create_sub(
-                            (chunk["offset"], chunk["duration"]), chunk["text"]
-                        )
-                return sub_maker, audio_data
-
-            # 获取音频数据和字幕信息
-            sub_maker, audio_data = asyncio.run(_do())
+                # 音频分块到达时直接写入文件，不在内存中拼接整段音频
+                with open(voice_file, "wb") as file:
+                    async for chunk in communicate.stream():
+                        if chunk["type"] == "audio":
+                            file.write(chunk["data"])
+                            audio_size += len(chunk["data"])
+                        elif chunk["type"] == "WordBoundary":
+                            sub_maker.create_sub(
+                                (chunk["offset"], chunk["duration"]), chunk["text"]
+                            )
+                return sub_maker, audio_size
+
+            # 生成音频文件并获取字幕信息
+            sub_maker, audio_size = _run_async(_do())
             
             # 验证数据是否有效
-            if not sub_maker or not sub_maker.subs or not audio_data:
+            if not sub_maker or not sub_maker.subs or not audio_size:
                 logger.warning(f"failed, invalid data generated")
+                _remove_partial_file(voice_file)
                 if i < 2:
                     time.sleep(1)
                 continue
 
-            # 数据有效，写入文件
-            with open(voice_file, "wb") as file:
-                file.write(audio_data)
             return sub_maker
         except Exception as e:
             logger.error(f"生成音频文件时出错: {str(e)}")
+            _remove_partial_file(voice_file)
             if i < 2:
                 time.sleep(1)
     return None
@@ -1132,12 +1195,14 @@ def azure_tts_v2(text: str, voice_name: str, voice_file: str) -> Union[SubMaker,
 
         return 0
 
+    if speechsdk is None:
+        logger.error("azure-cognitiveservices-speech 未安装，无法使用 Azure V2 语音")
+        return None
+
     for i in range(3):
         try:
             logger.info(f"start, voice name: {voice_name}, try: {i + 1}")
 
-            import azure.cognitiveservices.speech as speechsdk
-
             sub_maker = SubMaker()
 
             def speech_synthesizer_word_boundary_cb(evt: speechsdk.SessionEventArgs):
@@ -1196,19 +1261,12 @@ def azure_tts_v2(text: str, voice_name: str, voice_file: str) -> Union[SubMaker,
     return None
 
 
+# 换行、引号和各类括号统一替换为空格，一次 translate 完成全部替换
+_FORMAT_TEXT_TABLE = str.maketrans({c: " " for c in '\n"[](){}（）'})
+
+
 def _format_text(text: str) -> str:
-    text = text.replace("\n", " ")
-    text = text.replace("\"", " ")
-    text = text.replace("[", " ")
-    text = text.replace("]", " ")
-    text = text.replace("(", " ")
-    text = text.replace(")", " ")
-    text = text.replace("）", " ")
-    text = text.replace("（", " ")
-    text = text.replace("{", " ")
-    text = text.replace("}", " ")
-    text = text.strip()
-    return text
+    return text.translate(_FORMAT_TEXT_TABLE).strip()
 
 
 def create_subtitle_from_multiple(text: str, sub_maker_list: List[SubMaker], list_script: List[dict], 
@@ -1223,11 +1281,24 @@ def create_subtitle_from_multiple(text: str, sub_maker_list: List[SubMaker], lis
     """
     text = _format_text(text)
     sentences = utils.split_string_by_punctuations(text)
+    # 句子在匹配过程中不变，预先去除首尾空白
+    sentences_stripped = [sentence.strip() for sentence in sentences]
+    sentence_count = len(sentences)
+
+    def formatter(idx: int, start_time: float, end_time: float, sub_text: str) -> str:
+        # 时间只在生成字幕项时才格式化为字符串
+        start_t = utils.seconds_to_time(start_time).replace('.', ',')
+        end_t = utils.seconds_to_time(end_time).replace('.', ',')
+        return f"{idx}\n{start_t} --> {end_t}\n{sub_text}\n"
 
-    def formatter(idx: int, start_time: str, end_time: str, sub_text: str) -> str:
-        return f"{idx}\n{start_time.replace('.', ',')} --> {end_time.replace('.', ',')}\n{sub_text}\n"
+    # 字幕项直接写入缓冲区，各项之间以空行分隔
+    sub_buffer = io.StringIO()
+
+    def write_item(line: str):
+        if sub_buffer.tell():
+            sub_buffer.write("\n")
+        sub_buffer.write(line)
 
-    sub_items = []
     sub_index = 0
     sentence_index = 0
 
@@ -1244,18 +1315,22 @@ def create_subtitle_from_multiple(text: str, sub_maker_list: List[SubMaker], lis
             sub_maker = sub_maker_list[sub_maker_index]
             sub_maker_index += 1
 
-            script_duration = utils.time_to_seconds(end_time) - utils.time_to_seconds(start_time)
+            # 片段起始秒数在内层循环中不变，只解析一次
+            start_seconds = utils.time_to_seconds(start_time)
+            script_duration = utils.time_to_seconds(end_time) - start_seconds
             audio_duration = get_audio_duration(sub_maker)
             time_ratio = script_duration / audio_duration if audio_duration > 0 else 1
+            # 偏移量单位为100纳秒，换算系数与缩放比例合并为一次乘法
+            offset_scale = time_ratio / 10000000
 
             current_sub = ""
             current_start = None
             current_end = None
 
-            for offset, sub in zip(sub_maker.offset, sub_maker.subs):
+            for (offset_begin, offset_end), sub in zip(sub_maker.offset, sub_maker.subs):
                 sub = unescape(sub).strip()
-                sub_start = utils.seconds_to_time(utils.time_to_seconds(start_time) + offset[0] / 10000000 * time_ratio)
-                sub_end = utils.seconds_to_time(utils.time_to_seconds(start_time) + offset[1] / 10000000 * time_ratio)
+                sub_start = start_seconds + offset_begin * offset_scale
+                sub_end = start_seconds + offset_end * offset_scale
                 
                 if current_start is None:
                     current_start = sub_start
@@ -1263,17 +1338,21 @@ def create_subtitle_from_multiple(text: str, sub_maker_list: List[SubMaker], lis
                 
                 current_sub += sub
                 
-                # 检查当前累积的字幕是否匹配下一个句子
-                while sentence_index < len(sentences) and sentences[sentence_index] in current_sub:
+                # 检查当前累积的字幕是否匹配下一个句子，一次 find 同时完成查找和定位
+                while sentence_index < sentence_count:
+                    sentence = sentences[sentence_index]
+                    pos = current_sub.find(sentence)
+                    if pos < 0:
+                        break
                     sub_index += 1
                     line = formatter(
                         idx=sub_index,
                         start_time=current_start,
                         end_time=current_end,
-                        sub_text=sentences[sentence_index].strip(),
+                        sub_text=sentences_stripped[sentence_index],
                     )
-                    sub_items.append(line)
-                    current_sub = current_sub.replace(sentences[sentence_index], "", 1).strip()
+                    write_item(line)
+                    current_sub = (current_sub[:pos] + current_sub[pos + len(sentence):]).strip()
                     current_start = current_end
                     sentence_index += 1
 
@@ -1286,7 +1365,7 @@ def create_subtitle_from_multiple(text: str, sub_maker_list: List[SubMaker], lis
                         end_time=current_end,
                         sub_text=current_sub.strip(),
                     )
-                    sub_items.append(line)
+                    write_item(line)
                     current_sub = ""
                     current_start = current_end
 
@@ -1299,14 +1378,14 @@ def create_subtitle_from_multiple(text: str, sub_maker_list: List[SubMaker], lis
                     end_time=current_end,
                     sub_text=current_sub.strip(),
                 )
-                sub_items.append(line)
+                write_item(line)
 
-        if len(sub_items) == 0:
+        if not sub_buffer.tell():
             logger.error("No subtitle items generated")
             return
 
         with open(subtitle_file, "w", encoding="utf-8") as file:
-            file.write("\n".join(sub_items))
+            file.write(sub_buffer.getvalue())
 
         logger.info(f"completed, subtitle file created: {subtitle_file}")
     except Exception as e:
@@ -1339,6 +1418,9 @@ def create_subtitle(sub_maker: submaker.SubMaker, text: str, subtitle_file: str)
     sub_index = 0
 
     script_lines = utils.split_string_by_punctuations(text)
+    # 脚本行在匹配过程中不变，预先计算去除标点后的形式
+    script_lines_no_punct = [_PUNCTUATION_RE.sub("", _line) for _line in script_lines]
+    script_lines_words = [_NON_WORD_RE.sub("", _line) for _line in script_lines]
 
     def match_line(_sub_line: str, _sub_index: int):
         if len(script_lines) <= _sub_index:
@@ -1348,14 +1430,11 @@ def create_subtitle(sub_maker: submaker.SubMaker, text: str, subtitle_file: str)
         if _sub_line == _line:
             return script_lines[_sub_index].strip()
 
-        _sub_line_ = re.sub(r"[^\w\s]", "", _sub_line)
-        _line_ = re.sub(r"[^\w\s]", "", _line)
-        if _sub_line_ == _line_:
+        _line_ = script_lines_no_punct[_sub_index]
+        if _PUNCTUATION_RE.sub("", _sub_line) == _line_:
             return _line_.strip()
 
-        _sub_line_ = re.sub(r"\W+", "", _sub_line)
-        _line_ = re.sub(r"\W+", "", _line)
-        if _sub_line_ == _line_:
+        if _NON_WORD_RE.sub("", _sub_line) == script_lines_words[_sub_index]:
             return _line.strip()
 
         return ""
@@ -1416,54 +1495,107 @@ def get_audio_duration(sub_maker: submaker.SubMaker):
     return sub_maker.offset[-1][1] / 10000000
 
 
-def tts_multiple(task_id: str, list_script: list, voice_name: str, voice_rate: float, voice_pitch: float):
+def _get_tts_executor() -> ThreadPoolExecutor:
+    """获取进程内共享的TTS线程池，工作线程及其事件循环在多个片段和任务间复用"""
+    global _tts_executor
+    with _tts_executor_lock:
+        if _tts_executor is None:
+            max_workers = max(1, int(config.app.get("tts_max_concurrency", TTS_MAX_CONCURRENCY)))
+            _tts_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+        return _tts_executor
+
+
+def _tts_segment(item: dict, output_dir: str, voice_name: str, voice_rate: float, voice_pitch: float) -> Union[dict, None]:
     """
-    根据JSON文件中的多段文本进行TTS转换
-    
+    为单个脚本片段生成音频和字幕文件
+
+    :param item: 脚本片段
+    :param output_dir: 输出目录
+    :return: 音频生成结果，解说为空或生成失败时返回 None
+    """
+    # 将时间戳中的冒号替换为下划线
+    timestamp = item['timestamp'].replace(':', '_')
+    audio_file = os.path.join(output_dir, f"audio_{timestamp}.mp3")
+    subtitle_file = os.path.join(output_dir, f"subtitle_{timestamp}.srt")
+
+    text = item['narration']
+    if not text or not text.strip():
+        # 空解说无需调用 TTS，避免无意义的请求与重试
+        logger.warning(f"时间戳 {timestamp} 的解说文本为空，跳过音频生成")
+        return None
+
+    sub_maker = tts(
+        text=text,
+        voice_name=voice_name,
+        voice_rate=voice_rate,
+        voice_pitch=voice_pitch,
+        voice_file=audio_file,
+    )
+
+    if sub_maker is None:
+        logger.error(f"无法为时间戳 {timestamp} 生成音频; "
+                     f"如果您在中国，请使用VPN; "
+                     f"或者使用其他 tts 引擎")
+        return None
+
+    # 为当前片段生成字幕文件
+    _, duration = create_subtitle(sub_maker=sub_maker, text=text, subtitle_file=subtitle_file)
+
+    logger.info(f"已生成音频文件: {audio_file}")
+    return {
+        "_id": item['_id'],
+        "timestamp": item['timestamp'],
+        "audio_file": audio_file,
+        "subtitle_file": subtitle_file,
+        "duration": duration,
+        "text": text,
+    }
+
+
+def iter_tts_multiple(task_id: str, list_script: list, voice_name: str, voice_rate: float, voice_pitch: float) -> Iterator[dict]:
+    """
+    根据JSON文件中的多段文本进行TTS转换，多个片段并发请求，每生成一段音频即产出其结果，
+    便于下游（如视频裁剪）在后续片段合成的同时开始处理
+
     :param task_id: 任务ID
     :param list_script: 脚本列表
     :param voice_name: 语音名称
     :param voice_rate: 语音速率
-    :return: 生成的音频文件列表
+    :return: 按完成顺序逐段产出的音频生成结果
     """
     voice_name = parse_voice_name(voice_name)
     output_dir = utils.task_dir(task_id)
-    tts_results = []
-
-    for item in list_script:
-        if item['OST'] != 1:
-            # 将时间戳中的冒号替换为下划线
-            timestamp = item['timestamp'].replace(':', '_')
-            audio_file = os.path.join(output_dir, f"audio_{timestamp}.mp3")
-            subtitle_file = os.path.join(output_dir, f"subtitle_{timestamp}.srt")
-
-            text = item['narration']
-
-            sub_maker = tts(
-                text=text,
-                voice_name=voice_name,
-                voice_rate=voice_rate,
-                voice_pitch=voice_pitch,
-                voice_file=audio_file,
-            )
+    items = [item for item in list_script if item['OST'] != 1]
+    if not items:
+        return
+
+    executor = _get_tts_executor()
+    futures = [
+        executor.submit(_tts_segment, item, output_dir, voice_name, voice_rate, voice_pitch)
+        for item in items
+    ]
+    try:
+        for future in as_completed(futures):
+            tts_result = future.result()
+            if tts_result is not None:
+                yield tts_result
+    finally:
+        # 提前结束（下游异常或出错）时取消尚未开始的请求
+        for future in futures:
+            future.cancel()
 
-            if sub_maker is None:
-                logger.error(f"无法为时间戳 {timestamp} 生成音频; "
-                             f"如果您在中国，请使用VPN; "
-                             f"或者使用其他 tts 引擎")
-                continue
-            else:
-                # 为当前片段生成字幕文件
-                _, duration = create_subtitle(sub_maker=sub_maker, text=text, subtitle_file=subtitle_file)
-
-            tts_results.append({
-                "_id": item['_id'],
-                "timestamp": item['timestamp'],
-                "audio_file": audio_file,
-                "subtitle_file": subtitle_file,
-                "duration": duration,
-                "text": text,
-            })
-            logger.info(f"已生成音频文件: {audio_file}")
 
+def tts_multiple(task_id: str, list_script: list, voice_name: str, voice_rate: float, voice_pitch: float):
+    """
+    根据JSON文件中的多段文本进行TTS转换
+    
+    :param task_id: 任务ID
+    :param list_script: 脚本列表
+    :param voice_name: 语音名称
+    :param voice_rate: 语音速率
+    :return: 生成的音频文件列表，与脚本顺序一致
+    """
+    positions = {item['_id']: index for index, item in enumerate(list_script)}
+    tts_results = list(iter_tts_multiple(task_id, list_script, voice_name, voice_rate, voice_pitch))
+    tts_results.sort(key=lambda tts_result: positions[tts_result['_id']])
     return tts_results
@@ -0,0 +1,45 @@
+import pytest
+
+from app.utils import utils
+
+
+@pytest.mark.parametrize("convert", [utils.time_convert_seconds_to_hmsm, utils.format_time])
+@pytest.mark.parametrize("seconds, expected", [
+    (0, "00:00:00,000"),
+    (1.234, "00:00:01,234"),
+    # 毫秒四舍五入后进位到秒
+    (0.9996, "00:00:01,000"),
+    (59.9996, "00:01:00,000"),
+    (60, "00:01:00,000"),
+    (3599.9996, "01:00:00,000"),
+    (3600, "01:00:00,000"),
+    (3661.5, "01:01:01,500"),
+])
+def test_seconds_to_srt_time(convert, seconds, expected):
+    assert convert(seconds) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("你好，世界。", ["你好", "世界"]),
+    ("，开头的标点", ["开头的标点"]),
+    ("结尾的标点！", ["结尾的标点"]),
+    ("重复的标点！！？？中间", ["重复的标点", "中间"]),
+    ("\n\n开头换行\n\n\n中间换行\n", ["开头换行", "中间换行"]),
+    ("first line\nsecond line", ["first line", "second line"]),
+    # 数字中的小数点不作为分隔符
+    ("按2.5%收取手续费. 下一句", ["按2.5%收取手续费", "下一句"]),
+    ("末尾的数字2.", ["末尾的数字2"]),
+])
+def test_split_string_by_punctuations(text, expected):
+    assert utils.split_string_by_punctuations(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("没有标点的句子", ["没有标点的句子"]),
+    ("  两端有空白  ", ["两端有空白"]),
+    ("", []),
+    ("   ", []),
+    (" \t ", []),
+])
+def test_split_string_without_punctuations(text, expected):
+    assert utils.split_string_by_punctuations(text) == expected
@@ -4,6 +4,7 @@ FFmpeg 工具模块 - 提供 FFmpeg 相关的工具函数，特别是硬件加
 """
 import os
 import platform
+import shutil
 import subprocess
 import tempfile
 from typing import Dict, List, Optional, Tuple, Union
@@ -24,6 +25,9 @@ _FFMPEG_HW_ACCEL_INFO = {
     "tested_methods": []          # 已测试的方法
 }
 
+# ffmpeg 是否已确认可用，确认后不再重复检测
+_FFMPEG_INSTALLED = False
+
 # 硬件加速优先级配置（按平台和GPU类型）
 HWACCEL_PRIORITY = {
     "windows": {
@@ -119,9 +123,20 @@ def check_ffmpeg_installation() -> bool:
     """
     检查ffmpeg是否已安装
 
+    检查通过后缓存结果，后续调用不再启动子进程；未通过时不缓存，便于安装后重新检测
+
     Returns:
         bool: 如果安装则返回True，否则返回False
     """
+    global _FFMPEG_INSTALLED
+    if _FFMPEG_INSTALLED:
+        return True
+
+    # 先在PATH中查找，找不到时无需再启动子进程
+    if shutil.which('ffmpeg') is None:
+        logger.error("ffmpeg未安装或不在系统PATH中，请安装ffmpeg")
+        return False
+
     try:
         # 在Windows系统上使用UTF-8编码
         is_windows = os.name == 'nt'
@@ -129,6 +144,7 @@ def check_ffmpeg_installation() -> bool:
             subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding='utf-8', check=True)
         else:
             subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        _FFMPEG_INSTALLED = True
         return True
     except (subprocess.SubprocessError, FileNotFoundError):
         logger.error("ffmpeg未安装或不在系统PATH中，请安装ffmpeg")
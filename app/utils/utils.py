@@ -1,3 +1,4 @@
+import hashlib
 import locale
 import os
 import traceback
@@ -18,6 +19,9 @@ from app.services import material
 
 urllib3.disable_warnings()
 
+# 标点字符集合，"..." 等多字符标点已被其中的单字符覆盖
+_PUNCTUATION_CHARS = frozenset("".join(const.PUNCTUATIONS))
+
 
 def get_response(status: int, data: Any = None, message: str = ""):
     obj = {
@@ -189,11 +193,10 @@ def run_in_background(func, *args, **kwargs):
 
 
 def time_convert_seconds_to_hmsm(seconds) -> str:
-    hours = int(seconds // 3600)
-    seconds = seconds % 3600
-    minutes = int(seconds // 60)
-    milliseconds = int(seconds * 1000) % 1000
-    seconds = int(seconds % 60)
+    # 先换算为整数毫秒，避免浮点乘法误差导致毫秒位少 1
+    total_seconds, milliseconds = divmod(round(seconds * 1000), 1000)
+    total_minutes, seconds = divmod(total_seconds, 60)
+    hours, minutes = divmod(total_minutes, 60)
     return "{:02d}:{:02d}:{:02d},{:03d}".format(hours, minutes, seconds, milliseconds)
 
 
@@ -207,13 +210,10 @@ def format_time(seconds: float) -> str:
     返回:
         格式化的时间字符串，格式为 HH:MM:SS,mmm
     """
-    # 计算小时、分钟、秒和毫秒
-    hours = int(seconds // 3600)
-    remaining_seconds = seconds % 3600
-    minutes = int(remaining_seconds // 60)
-    remaining_seconds = remaining_seconds % 60
-    secs = int(remaining_seconds)
-    milliseconds = int((remaining_seconds - secs) * 1000)
+    # 换算为整数毫秒后再计算小时、分钟、秒和毫秒
+    total_seconds, milliseconds = divmod(round(seconds * 1000), 1000)
+    total_minutes, secs = divmod(total_seconds, 60)
+    hours, minutes = divmod(total_minutes, 60)
     
     # 格式化为时间字符串
     return "{:02d}:{:02d}:{:02d},{:03d}".format(hours, minutes, secs, milliseconds)
@@ -235,49 +235,35 @@ def text_to_srt(idx: int, msg: str, start_time: float, end_time: float) -> str:
 
 
 def str_contains_punctuation(word):
-    for p in const.PUNCTUATIONS:
-        if p in word:
-            return True
-    return False
+    return not _PUNCTUATION_CHARS.isdisjoint(word)
 
 
 def split_string_by_punctuations(s):
+    if "\n" not in s and _PUNCTUATION_CHARS.isdisjoint(s):
+        # 不含任何分隔符时无需逐字符扫描
+        s = s.strip()
+        return [s] if s else []
+
     result = []
-    txt = ""
-
-    previous_char = ""
-    next_char = ""
-    for i in range(len(s)):
-        char = s[i]
-        if char == "\n":
-            result.append(txt.strip())
-            txt = ""
+    start = 0
+    last_index = len(s) - 1
+    for i, char in enumerate(s):
+        if char != "\n" and char not in _PUNCTUATION_CHARS:
             continue
 
-        if i > 0:
-            previous_char = s[i - 1]
-        if i < len(s) - 1:
-            next_char = s[i + 1]
-
-        if char == "." and previous_char.isdigit() and next_char.isdigit():
+        if char == "." and 0 < i < last_index and s[i - 1].isdigit() and s[i + 1].isdigit():
             # 取现1万，按2.5%收取手续费, 2.5 中的 . 不能作为换行标记
-            txt += char
             continue
 
-        if char not in const.PUNCTUATIONS:
-            txt += char
-        else:
-            result.append(txt.strip())
-            txt = ""
-    result.append(txt.strip())
+        result.append(s[start:i].strip())
+        start = i + 1
+    result.append(s[start:].strip())
     # filter empty string
     result = list(filter(None, result))
     return result
 
 
 def md5(text):
-    import hashlib
-
     return hashlib.md5(text.encode("utf-8")).hexdigest()
 
 
@@ -10,8 +10,25 @@ from datetime import datetime
 
 from app.config import config
 from app.utils import utils, video_processor
+from app.services.llm import close_loop_clients
 from webui.tools.base import create_vision_analyzer, get_batch_files, get_batch_timestamps, chekc_video_config
 
+try:
+    # orjson 在C层序列化，保存体积较大的逐帧分析结果时比标准库快得多
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _save_json(data, file_path: str):
+    """保存分析结果为缩进2格的JSON，安装了orjson时直接写入序列化后的字节"""
+    if orjson is not None:
+        with open(file_path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
 
 def generate_script_docu(params):
     """
@@ -182,14 +199,18 @@ def generate_script_docu(params):
 
 请只返回 JSON 字符串，不要包含任何其他解释性文字。
                 """
-                results = loop.run_until_complete(
-                    analyzer.analyze_images(
-                        images=keyframe_files,
-                        prompt=vision_analysis_prompt,
-                        batch_size=vision_batch_size
+                try:
+                    results = loop.run_until_complete(
+                        analyzer.analyze_images(
+                            images=keyframe_files,
+                            prompt=vision_analysis_prompt,
+                            batch_size=vision_batch_size
+                        )
                     )
-                )
-                loop.close()
+                finally:
+                    # 关闭事件循环前释放其上的共享HTTP连接池
+                    close_loop_clients(loop)
+                    loop.close()
 
                 """
                 3. 处理分析结果（格式化为 json 数据）
@@ -208,8 +229,7 @@ def generate_script_docu(params):
                 analysis_dir = os.path.join(utils.storage_dir(), "temp", "analysis")
                 os.makedirs(analysis_dir, exist_ok=True)
                 origin_res = os.path.join(analysis_dir, "frame_analysis.json")
-                with open(origin_res, 'w', encoding='utf-8') as f:
-                    json.dump(results, f, ensure_ascii=False, indent=2)
+                _save_json(results, origin_res)
                 
                 # 开始处理
                 for result in results:
@@ -359,8 +379,7 @@ def generate_script_docu(params):
                 # 保存完整的分析结果为JSON
                 analysis_filename = f"frame_analysis_{timestamp_str}.json"
                 analysis_json_path = os.path.join(analysis_dir, analysis_filename)
-                with open(analysis_json_path, 'w', encoding='utf-8') as f:
-                    json.dump(merged_results, f, ensure_ascii=False, indent=2)
+                _save_json(merged_results, analysis_json_path)
                 logger.info(f"分析结果已保存到: {analysis_json_path}")
 
                 """